@@ -0,0 +1,256 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from Shop.models import (
+    MONEY,
+    Category,
+    CategorySalesDaily,
+    OrderedProduct,
+    Product,
+    ProductSalesDaily,
+    SalesDaily,
+)
+
+REBUILD_BATCH_SIZE = 2000
+COUNTERS = ("revenue", "units", "orders")
+
+
+def line_revenue():
+    """The checkout snapshot, or the live price for lines without one."""
+    return Coalesce(
+        F("line_total"), F("quantity") * F("product__effective_price"), output_field=MONEY
+    )
+
+
+def _increment_postgres(model, keys, labels, rows):
+    """
+    Add ``rows`` (key values, then label values, then revenue, units, orders)
+    to the counters of ``model`` with a single ``INSERT ... ON CONFLICT DO
+    UPDATE``. Labels are overwritten with the latest values.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    fields = [model._meta.get_field(name) for name in (*keys, *labels, *COUNTERS)]
+    columns = [qn(field.column) for field in fields]
+    row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    updates = ", ".join(
+        [f"{qn(c)} = EXCLUDED.{qn(c)}" for c in labels]
+        + [f"{qn(c)} = {table}.{qn(c)} + EXCLUDED.{qn(c)}" for c in COUNTERS]
+    )
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES {', '.join([row_sql] * len(rows))} "
+        f"ON CONFLICT ({', '.join(columns[: len(keys)])}) DO UPDATE SET {updates}"
+    )
+    params = [
+        field.get_db_prep_value(value, connection)
+        for row in rows
+        for field, value in zip(fields, row)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _increment_orm(model, keys, labels, rows):
+    # SQLite cannot enforce the NULLS NOT DISTINCT key the upsert relies on.
+    attnames = [model._meta.get_field(key).attname for key in keys]
+    for row in rows:
+        lookup = dict(zip(attnames, row))
+        values = dict(zip(labels, row[len(keys) :]))
+        counters = dict(zip(COUNTERS, row[len(keys) + len(labels) :]))
+        updated = model.objects.filter(**lookup).update(
+            **values, **{name: F(name) + value for name, value in counters.items()}
+        )
+        if not updated:
+            model.objects.create(**lookup, **values, **counters)
+
+
+def _increment(model, keys, rows, labels=()):
+    if not rows:
+        return
+    if connection.vendor == "postgresql":
+        _increment_postgres(model, keys, labels, rows)
+    else:
+        _increment_orm(model, keys, labels, rows)
+
+
+def record_paid_order(order_id, paid_at):
+    """
+    Add a newly paid order to the daily rollups. Call it in the transaction
+    that flips ``paid``, and only when that update matched, so a redelivered
+    webhook is not counted twice.
+    """
+    day = timezone.localdate(paid_at)
+    lines = (
+        OrderedProduct.objects.filter(order_id=order_id)
+        .values(
+            "product_id",
+            "product__name",
+            "product__category_id",
+            "product__category__name",
+        )
+        .annotate(revenue=Sum(line_revenue()), units=Sum("quantity"))
+    )
+
+    products, categories, names = [], defaultdict(lambda: [Decimal("0"), 0]), {}
+    for line in lines:
+        products.append(
+            (
+                day,
+                line["product_id"],
+                line["product__name"],
+                line["revenue"],
+                line["units"],
+                1,
+            )
+        )
+        cid = line["product__category_id"]
+        names[cid] = line["product__category__name"]
+        categories[cid][0] += line["revenue"]
+        categories[cid][1] += line["units"]
+    if not products:
+        return
+
+    _increment(ProductSalesDaily, ["day", "product"], products, labels=["product_name"])
+    _increment(
+        CategorySalesDaily,
+        ["day", "category"],
+        [
+            (day, cid, names[cid], revenue, units, 1)
+            for cid, (revenue, units) in categories.items()
+        ],
+        labels=["category_name"],
+    )
+    _increment(
+        SalesDaily,
+        ["day"],
+        [
+            (
+                day,
+                sum(row[3] for row in products),
+                sum(row[4] for row in products),
+                1,
+            )
+        ],
+    )
+
+
+def rebuild_rollups(since=None, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recompute the rollups from paid orders, from ``since`` (a date) onwards
+    or entirely. Orders paid before ``paid_at`` was recorded count on the day
+    they were created. Returns the number of product-day rows written.
+    """
+    day = TruncDate(
+        Coalesce("order__paid_at", "order__created_at"),
+        tzinfo=timezone.get_current_timezone(),
+    )
+    lines = OrderedProduct.objects.filter(order__paid=True).annotate(day=day)
+    if since is not None:
+        lines = lines.filter(day__gte=since)
+
+    def aggregate(*keys):
+        return (
+            lines.values("day", *keys)
+            .annotate(
+                revenue=Sum(line_revenue()),
+                units=Sum("quantity"),
+                orders=Count("order_id", distinct=True),
+            )
+            .order_by("day", *keys)
+            .iterator(chunk_size=batch_size)
+        )
+
+    written = {}
+    with transaction.atomic():
+        for model in (SalesDaily, ProductSalesDaily, CategorySalesDaily):
+            stale = model.objects.all()
+            if since is not None:
+                stale = stale.filter(day__gte=since)
+            stale.delete()
+
+        for model, keys, fields in (
+            (SalesDaily, (), ()),
+            (
+                ProductSalesDaily,
+                ("product_id", "product__name"),
+                ("product_id", "product_name"),
+            ),
+            (
+                CategorySalesDaily,
+                ("product__category_id", "product__category__name"),
+                ("category_id", "category_name"),
+            ),
+        ):
+            written[model] = 0
+            batch = []
+            for row in aggregate(*keys):
+                values = {field: row[key] for field, key in zip(fields, keys)}
+                batch.append(
+                    model(day=row["day"], **values, **{c: row[c] for c in COUNTERS})
+                )
+                if len(batch) >= batch_size:
+                    written[model] += len(model.objects.bulk_create(batch))
+                    batch = []
+            written[model] += len(model.objects.bulk_create(batch))
+    return written[ProductSalesDaily]
+
+
+def _range(queryset, date_from, date_to):
+    return queryset.filter(day__gte=date_from, day__lte=date_to)
+
+
+def daily_sales(date_from, date_to):
+    return list(
+        _range(SalesDaily.objects, date_from, date_to)
+        .order_by("day")
+        .values("day", *COUNTERS)
+    )
+
+
+def _grouped(queryset, key, name, model, ordering, limit=None):
+    # Sums are aliased because annotations may not shadow the model's fields.
+    # The live name wins; the copy taken at sale time covers deleted rows.
+    live_name = model.objects.filter(pk=OuterRef(key)).values("name")
+    rows = (
+        queryset.values(key)
+        .annotate(
+            total_name=Coalesce(Subquery(live_name), Max(name)),
+            **{f"total_{c}": Sum(c) for c in COUNTERS},
+        )
+        .order_by(*ordering)
+    )
+    if limit is not None:
+        rows = rows[:limit]
+    return [
+        {key: row[key], name: row["total_name"], **{c: row[f"total_{c}"] for c in COUNTERS}}
+        for row in rows
+    ]
+
+
+def top_products(date_from, date_to, by="revenue", limit=10):
+    queryset = _range(ProductSalesDaily.objects, date_from, date_to)
+    return _grouped(
+        queryset,
+        "product_id",
+        "product_name",
+        Product,
+        (f"-total_{by}", "product_id"),
+        limit=limit,
+    )
+
+
+def category_sales(date_from, date_to):
+    queryset = _range(CategorySalesDaily.objects, date_from, date_to)
+    return _grouped(
+        queryset,
+        "category_id",
+        "category_name",
+        Category,
+        ("-total_revenue", "category_id"),
+    )
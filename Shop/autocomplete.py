@@ -0,0 +1,108 @@
+import heapq
+import re
+import threading
+from array import array
+from bisect import bisect_left
+
+from Shop.cache import catalog_version
+from Shop.models import Product
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+# Prefixes this short match a large slice of the catalog, so their ranked
+# results are memoized per index instead of being re-ranked per keystroke.
+MEMO_PREFIX_LENGTH = 2
+
+WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    return " ".join(WORD_RE.findall(text.casefold()))
+
+
+class PrefixIndex:
+    """
+    Sorted array of name keys searched with ``bisect``.
+
+    Every product contributes one key per word of its name, starting at that
+    word ("red phone case" -> "red phone case", "phone case", "case"), so a
+    query matches at any word boundary. Products are numbered in rank order,
+    which makes ranking a match range a matter of taking the smallest numbers.
+    """
+
+    def __init__(self, rows):
+        self.ids = []
+        self.names = []
+        entries = []
+        for rank, (pk, name) in enumerate(rows):
+            self.ids.append(pk)
+            self.names.append(name)
+            words = normalize(name).split(" ")
+            entries.extend((" ".join(words[i:]), rank) for i in range(len(words)))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ranks = array("I", (rank for _, rank in entries))
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        if len(prefix) <= MEMO_PREFIX_LENGTH:
+            ranks = self._memo.get(prefix)
+            if ranks is None:
+                ranks = self._memo[prefix] = self._match(prefix, MAX_LIMIT)
+        else:
+            ranks = self._match(prefix, limit)
+        return [{"id": self.ids[r], "name": self.names[r]} for r in ranks[:limit]]
+
+    def _match(self, prefix, limit):
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\uffff", lo)
+        return heapq.nsmallest(limit, set(self.ranks[lo:hi]))
+
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+
+def build_index():
+    rows = (
+        Product.objects.order_by("-rating_sum", "name", "id")
+        .values_list("id", "name")
+        .iterator(chunk_size=2000)
+    )
+    return PrefixIndex(rows)
+
+
+def get_autocomplete_index():
+    """
+    Return this process's index, rebuilding it after any catalog write.
+
+    The only per-request cost is the catalog version lookup in the cache.
+    One request rebuilds a stale index while the others keep answering from
+    the old one; only the very first build makes callers wait.
+    """
+    global _index, _index_version
+
+    version = catalog_version()
+    if _index is not None:
+        if _index_version == version or not _lock.acquire(blocking=False):
+            return _index
+    else:
+        _lock.acquire()
+    try:
+        if _index is None or _index_version != version:
+            _index = build_index()
+            _index_version = version
+    finally:
+        _lock.release()
+    return _index
+
+
+def autocomplete(query, limit=DEFAULT_LIMIT):
+    return get_autocomplete_index().search(query, min(max(limit, 1), MAX_LIMIT))
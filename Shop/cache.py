@@ -0,0 +1,160 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = "catalog:version"
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def _incr_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, 2, timeout=None)
+
+
+def bump_catalog_version():
+    """
+    Invalidate every catalog-derived cache entry.
+
+    Bumps now, so readers stop using old entries immediately, and again on
+    commit, so an entry filled from pre-commit data is not served afterwards.
+    """
+    _incr_catalog_version()
+    transaction.on_commit(_incr_catalog_version)
+
+
+class LockBusy(Exception):
+    """The lock was still held by someone else when the wait ran out."""
+
+
+@contextmanager
+def cache_lock(key, timeout, wait, busy=LockBusy):
+    """
+    Mutual exclusion across workers through ``cache.add``, which is atomic in
+    Redis and locmem. ``timeout`` bounds how long a crashed holder blocks
+    others; ``wait`` is how long to poll before raising ``busy``.
+    """
+    deadline = time.monotonic() + wait
+    while not cache.add(key, 1, timeout=timeout):
+        if time.monotonic() > deadline:
+            raise busy
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+class LocalLRU:
+    """Process-local LRU bounded by the pickled size of its entries."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, blob = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+        return pickle.loads(blob)
+
+    def set(self, key, value, timeout):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (time.monotonic() + timeout, blob)
+            self.size += len(blob)
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class VersionedResponseCache:
+    """
+    Response data cache keyed on normalized query params and the catalog version.
+
+    Lookups go to the local LRU first and then to the Django cache backend.
+    Old entries are never deleted explicitly: bumping the catalog version
+    changes every key, and stale entries age out by TTL or LRU eviction.
+    """
+
+    def __init__(self, prefix, timeout=None, local_max_bytes=None, ignored_params=()):
+        self.prefix = prefix
+        self.ignored_params = set(ignored_params)
+        self.timeout = (
+            settings.CATALOG_CACHE_TTL if timeout is None else timeout
+        )
+        self.local = LocalLRU(
+            settings.CATALOG_CACHE_LOCAL_MAX_BYTES
+            if local_max_bytes is None
+            else local_max_bytes
+        )
+
+    def signature(self, request):
+        params = sorted(
+            (key, sorted(v for v in values if v != ""))
+            for key, values in request.query_params.lists()
+            if key not in self.ignored_params
+        )
+        params = [(key, values) for key, values in params if values]
+        raw = repr((request.get_host(), params)).encode()
+        return hashlib.sha1(raw).hexdigest()
+
+    def key(self, request):
+        return f"{self.prefix}:v{catalog_version()}:{self.signature(request)}"
+
+    def get(self, key):
+        data = self.local.get(key)
+        if data is not None:
+            return data
+        data = cache.get(key)
+        if data is not None:
+            self.local.set(key, data, self.timeout)
+        return data
+
+    def set(self, key, data):
+        if not self.timeout:
+            return
+        self.local.set(key, data, self.timeout)
+        cache.set(key, data, self.timeout)
+
+
+product_list_cache = VersionedResponseCache("products:list")
+product_facets_cache = VersionedResponseCache(
+    "products:facets",
+    ignored_params=("page", "page_size", "sort", "pagination", "cursor"),
+)
@@ -0,0 +1,274 @@
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, When
+
+from Shop.cache import LockBusy, cache_lock
+from Shop.models import Card, CardProduct, Product
+
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 2.0
+
+
+class CartBusy(LockBusy):
+    """Another request is holding the cart lock."""
+
+
+class DatabaseCart:
+    """Cart contents live in ``CardProduct``; every change is written through."""
+
+    def __init__(self, user):
+        self.user = user
+
+    def add(self, product_id, quantity):
+        product = Product.objects.only("id", "stock").get(id=product_id)
+        with transaction.atomic():
+            card, created = Card.objects.get_or_create(user=self.user)
+            return card.to_card(product=product, quantity=quantity)
+
+    def remove(self, product_id, quantity=None):
+        card = Card.objects.get(user=self.user)
+        product = Product.objects.only("id", "stock").get(id=product_id)
+        return card.remove_card(product=product, quantity=quantity)
+
+    def apply(self, operations):
+        with transaction.atomic():
+            card, created = Card.objects.get_or_create(user=self.user)
+            return card.apply_operations(operations)
+
+    def persist(self):
+        """Flush pending changes to ``CardProduct``; True if anything was written."""
+        return False
+
+    def discard(self):
+        pass
+
+    @contextmanager
+    def checkout(self):
+        """Hold the cart while its ``CardProduct`` lines are moved to an order."""
+        yield
+
+
+class CacheCart(DatabaseCart):
+    """
+    Cart lines are kept in the Django cache and written to ``CardProduct``
+    behind the request, by the ``persist_cart`` task and at checkout.
+
+    Stock is still reserved with the conditional UPDATE on every add, so the
+    cache never hands out units the database has not reserved. An add costs
+    that UPDATE plus cache round-trips; a remove releases stock and shrinks
+    the stored line in one transaction. Batch operations go through the
+    database path after flushing the cached lines.
+    """
+
+    def __init__(self, user):
+        super().__init__(user)
+        self.key = f"cart:{user.pk}"
+
+    @classmethod
+    def for_user_id(cls, user_id):
+        return cls(get_user_model()(pk=user_id))
+
+    def lock(self):
+        return cache_lock(f"{self.key}:lock", LOCK_TIMEOUT, LOCK_WAIT, busy=CartBusy)
+
+    def load(self):
+        state = cache.get(self.key)
+        if state is None:
+            rows = CardProduct.objects.filter(card__user=self.user).values_list(
+                "product_id", "quantity"
+            )
+            lines = {str(pid): qty for pid, qty in rows}
+            state = {"lines": lines, "saved": dict(lines), "dirty": False}
+        return state
+
+    def save(self, state):
+        cache.set(self.key, state, timeout=settings.CART_CACHE_TIMEOUT)
+        if state["dirty"]:
+            self.schedule_persist()
+
+    def schedule_persist(self):
+        from Shop.tasks import persist_cart
+
+        delay = settings.CART_PERSIST_DELAY
+        # One pending flush per cart; it reads whatever state exists when it
+        # runs. The marker expires before the task fires, so a change made
+        # after that point schedules a new flush.
+        if cache.add(f"{self.key}:flush", 1, timeout=delay):
+            user_id = self.user.pk
+            transaction.on_commit(
+                lambda: persist_cart.apply_async((user_id,), countdown=delay + 1)
+            )
+
+    def add(self, product_id, quantity):
+        with self.lock():
+            if not Product.reserve_stock(product_id, quantity):
+                if not Product.objects.filter(id=product_id).exists():
+                    raise Product.DoesNotExist
+                return False
+            state = self.load()
+            pid = str(product_id)
+            state["lines"][pid] = state["lines"].get(pid, 0) + quantity
+            state["dirty"] = True
+            self.save(state)
+        return True
+
+    def remove(self, product_id, quantity=None):
+        with self.lock():
+            state = self.load()
+            pid = str(product_id)
+            with transaction.atomic():
+                # The stored line shrinks with the release, so the release
+                # task can never return the same units a second time.
+                lines = CardProduct.objects.select_for_update().filter(card__user=self.user)
+                stored = self._stored(lines)
+                self._drop_released(state, stored)
+                in_cart = state["lines"].get(pid)
+                if not in_cart:
+                    return False
+                if quantity is None or quantity >= in_cart:
+                    quantity = in_cart
+                    del state["lines"][pid]
+                else:
+                    state["lines"][pid] = in_cart - quantity
+                Product.release_stock(product_id, quantity)
+
+                left = state["lines"].get(pid, 0)
+                if stored.get(pid, 0) > left:
+                    line = CardProduct.objects.filter(
+                        card__user=self.user, product_id=product_id
+                    )
+                    if left:
+                        line.update(quantity=left)
+                        state["saved"][pid] = left
+                    else:
+                        line.delete()
+                        state["saved"].pop(pid, None)
+            state["dirty"] = True
+            self.save(state)
+        return True
+
+    def apply(self, operations):
+        with self.lock():
+            self._persist()
+            results = super().apply(operations)
+            cache.delete(self.key)
+        return results
+
+    def persist(self):
+        with self.lock():
+            return self._persist()
+
+    def _persist(self):
+        state = cache.get(self.key)
+        if not state or not state["dirty"]:
+            return False
+
+        with transaction.atomic():
+            card, created = Card.objects.get_or_create(user=self.user)
+            # Locked lines are skipped by the release task until this commits.
+            stored = self._stored(CardProduct.objects.select_for_update().filter(card=card))
+            self._drop_released(state, stored)
+
+            lines = {str(uuid.UUID(pid)): qty for pid, qty in state["lines"].items() if qty}
+            grown = [pid for pid, qty in lines.items() if qty > stored.get(pid, 0)]
+            shrunk = {
+                pid: qty
+                for pid, qty in lines.items()
+                if pid in stored and qty < stored[pid]
+            }
+            # Only a line that grew starts a new reservation period.
+            CardProduct.objects.bulk_create(
+                [
+                    CardProduct(card=card, product_id=uuid.UUID(pid), quantity=lines[pid])
+                    for pid in grown
+                ],
+                update_conflicts=True,
+                unique_fields=["card", "product"],
+                update_fields=["quantity", "reserved_at"],
+            )
+            if shrunk:
+                CardProduct.objects.filter(card=card, product_id__in=shrunk).update(
+                    quantity=Case(
+                        *(When(product_id=pid, then=qty) for pid, qty in shrunk.items())
+                    )
+                )
+            CardProduct.objects.filter(card=card).exclude(product_id__in=lines).delete()
+
+        state["lines"] = lines
+        state["saved"] = dict(lines)
+        state["dirty"] = False
+        cache.set(self.key, state, timeout=settings.CART_CACHE_TIMEOUT)
+        return True
+
+    @staticmethod
+    def _stored(lines):
+        return {str(pid): qty for pid, qty in lines.values_list("product_id", "quantity")}
+
+    @staticmethod
+    def _drop_released(state, stored):
+        """
+        Take out of the cached lines what the release task deleted since the
+        last flush: whatever that flush saved and ``stored`` no longer holds.
+        The stock is already back, so these units are no longer reserved.
+        """
+        saved = state.setdefault("saved", {})
+        for pid, quantity in list(saved.items()):
+            released = quantity - stored.get(pid, 0)
+            if released <= 0:
+                continue
+            if stored.get(pid):
+                saved[pid] = stored[pid]
+            else:
+                del saved[pid]
+            left = state["lines"].get(pid, 0) - released
+            if left > 0:
+                state["lines"][pid] = left
+            else:
+                state["lines"].pop(pid, None)
+
+    def discard(self):
+        with self.lock():
+            cache.delete(self.key)
+
+    @contextmanager
+    def checkout(self):
+        """
+        Flush the cached lines and keep the lock until the order has taken
+        them, then drop the entry. Otherwise the cached copy would still list
+        the ordered lines, and removing them would return their stock.
+        """
+        with self.lock():
+            self._persist()
+            yield
+            cache.delete(self.key)
+
+    def forget(self):
+        """
+        Drop lines that expired in the database. A clean entry is simply
+        reloaded later; a dirty one keeps only the quantities added since its
+        last flush. Calling it twice, or not at all, is harmless: the next
+        flush makes the same comparison.
+        """
+        with self.lock():
+            state = cache.get(self.key)
+            if state is None:
+                return
+            if not state["dirty"]:
+                cache.delete(self.key)
+                return
+            self._drop_released(
+                state, self._stored(CardProduct.objects.filter(card__user=self.user))
+            )
+            cache.set(self.key, state, timeout=settings.CART_CACHE_TIMEOUT)
+
+
+CART_BACKENDS = {"db": DatabaseCart, "cache": CacheCart}
+
+
+def get_cart(user):
+    return CART_BACKENDS[settings.CART_BACKEND](user)
@@ -0,0 +1,102 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    Weak ETag / Last-Modified support for ``list`` and ``retrieve``.
+
+    The validators come from one aggregate over the filtered queryset (row
+    count plus the newest ``modified_fields`` timestamp), so a matching
+    ``If-None-Match`` / ``If-Modified-Since`` is answered with a 304 before
+    the page is fetched or serialized. Views that can validate a list more
+    cheaply override ``get_list_conditional_state``; ``list_response`` builds
+    the full response when the client copy is stale.
+    """
+
+    modified_fields = ("updated_at",)
+
+    def get_conditional_queryset(self, queryset):
+        """Hook to restrict the rows a retrieve may be validated against."""
+        return queryset
+
+    def make_etag(self, *parts):
+        request = self.request
+        renderer = getattr(request, "accepted_renderer", None)
+        source = repr(
+            (
+                request.path,
+                sorted(request.query_params.lists()),
+                getattr(renderer, "format", None),
+            )
+            + parts
+        )
+        return 'W/"%s"' % hashlib.sha1(source.encode()).hexdigest()
+
+    def get_list_conditional_state(self):
+        return self.get_conditional_state(self.filter_queryset(self.get_queryset()))
+
+    def get_conditional_state(self, queryset):
+        aggregates = {
+            f"m{i}": Max(field) for i, field in enumerate(self.modified_fields)
+        }
+        values = queryset.order_by().aggregate(count=Count("pk", distinct=True), **aggregates)
+        if not values["count"]:
+            return None
+
+        stamps = [v for key, v in values.items() if key != "count" and v is not None]
+        last_modified = int(max(stamps).timestamp()) if stamps else None
+        etag = self.make_etag(values["count"], [v.isoformat() for v in stamps])
+        return etag, last_modified
+
+    def conditional_response(self, state):
+        if state is None:
+            return None
+        etag, last_modified = state
+        response = get_conditional_response(
+            self.request._request, etag=etag, last_modified=last_modified
+        )
+        if isinstance(response, HttpResponseNotModified):
+            return self.set_conditional_headers(response, state)
+        return None
+
+    def set_conditional_headers(self, response, state):
+        if state is not None and response.status_code in (200, 304):
+            etag, last_modified = state
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        self.conditional_state = self.get_list_conditional_state()
+        not_modified = self.conditional_response(self.conditional_state)
+        if not_modified is not None:
+            return not_modified
+        response = self.list_response(request, *args, **kwargs)
+        return self.set_conditional_headers(response, self.conditional_state)
+
+    def list_response(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            # Same as get_object_or_404: a malformed id is simply not found.
+            raise Http404
+        queryset = self.get_conditional_queryset(queryset)
+        self.conditional_state = self.get_conditional_state(queryset)
+        not_modified = self.conditional_response(self.conditional_state)
+        if not_modified is not None:
+            return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        return self.set_conditional_headers(response, self.conditional_state)
@@ -0,0 +1,117 @@
+import csv
+from dataclasses import dataclass
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from Shop.models import Order, OrderedProduct, Transaction
+
+CHUNK_SIZE = 2000
+# Rows are joined into one string per flush instead of yielding each line.
+FLUSH_ROWS = 500
+
+
+@dataclass(frozen=True)
+class Export:
+    model: type
+    date_field: str
+    columns: tuple
+
+    def rows(self, created_after=None, created_before=None):
+        """Plain value tuples in date order, read with a server-side cursor."""
+        queryset = self.model.objects.all()
+        if created_after is not None:
+            queryset = queryset.filter(**{f"{self.date_field}__gte": created_after})
+        if created_before is not None:
+            queryset = queryset.filter(**{f"{self.date_field}__lt": created_before})
+        return (
+            queryset.order_by(self.date_field, "id")
+            .values_list(*self.columns)
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+
+
+EXPORTS = {
+    "orders": Export(
+        Order,
+        "created_at",
+        (
+            "id",
+            "created_at",
+            "user_id",
+            "user__email",
+            "status",
+            "paid",
+            "total_amount",
+            "item_count",
+            "stripe_payment_intent",
+            "latitude",
+            "longitude",
+        ),
+    ),
+    "order_lines": Export(
+        OrderedProduct,
+        "order__created_at",
+        (
+            "id",
+            "order_id",
+            "order__created_at",
+            "product_id",
+            "product__name",
+            "quantity",
+            "unit_price",
+            "discount_percent",
+            "line_total",
+        ),
+    ),
+    "transactions": Export(
+        Transaction,
+        "created_at",
+        (
+            "id",
+            "created_at",
+            "order_id",
+            "user_id",
+            "stripe_payment_intent",
+            "amount",
+            "currency",
+            "status",
+        ),
+    ),
+}
+
+
+class _Echo:
+    """File-like object for csv.writer that hands each line back."""
+
+    def write(self, value):
+        return value
+
+
+def _buffered(lines):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= FLUSH_ROWS:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    yield from _buffered(writer.writerow(row) for row in rows)
+
+
+def stream_jsonl(columns, rows):
+    encoder = DjangoJSONEncoder()
+    yield from _buffered(
+        encoder.encode(dict(zip(columns, row))) + "\n" for row in rows
+    )
+
+
+FORMATS = {
+    "csv": ("text/csv", stream_csv),
+    "jsonl": ("application/x-ndjson", stream_jsonl),
+}
@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+from django.db.models import Count, F, IntegerField, Max, Min, Q, Value
+from django.db.models.functions import Cast, Floor, Least
+
+DISCOUNT_RANGES = (
+    ("0", 0, 0),
+    ("1-10", 1, 10),
+    ("11-25", 11, 25),
+    ("26-50", 26, 50),
+    ("51-100", 51, 100),
+)
+RATING_BUCKETS = (1, 2, 3, 4)
+DEFAULT_PRICE_BUCKETS = 10
+MAX_PRICE_BUCKETS = 50
+CENT = Decimal("0.01")
+
+
+def product_facets(queryset, price_field="price", buckets=DEFAULT_PRICE_BUCKETS):
+    """
+    Facet counts for an already filtered product queryset.
+
+    Uses three grouped queries: one per category, one conditional aggregate
+    for the price bounds, discount ranges and rating buckets, and one for
+    the price histogram.
+    """
+    queryset = queryset.order_by()
+
+    categories = [
+        {"category": category, "name": name, "count": count}
+        for category, name, count in queryset.values_list("category", "category__name")
+        .annotate(count=Count("id"))
+        .order_by("-count", "category__name")
+    ]
+
+    aggregates = {
+        "total": Count("id"),
+        "price_min": Min(price_field),
+        "price_max": Max(price_field),
+        "unrated": Count("id", filter=Q(rating_count=0)),
+    }
+    for label, low, high in DISCOUNT_RANGES:
+        aggregates[f"discount_{label}"] = Count(
+            "id", filter=Q(discount_percent__gte=low, discount_percent__lte=high)
+        )
+    # Cumulative, like the "4 stars & up" filters the labels stand for.
+    for grade in RATING_BUCKETS:
+        rating = Q(rating_count__gt=0, rating_avg__gte=grade)
+        aggregates[f"rating_{grade}"] = Count("id", filter=rating)
+    totals = queryset.aggregate(**aggregates)
+
+    return {
+        "total": totals["total"],
+        "categories": categories,
+        "price": _price_histogram(queryset, price_field, totals, buckets),
+        "discount": [
+            {"range": label, "count": totals[f"discount_{label}"]}
+            for label, _, _ in DISCOUNT_RANGES
+        ],
+        "rating": [{"bucket": "unrated", "count": totals["unrated"]}]
+        + [
+            {"bucket": f"{grade}+", "count": totals[f"rating_{grade}"]}
+            for grade in RATING_BUCKETS
+        ],
+    }
+
+
+def _price_histogram(queryset, price_field, totals, buckets):
+    low, high = totals["price_min"], totals["price_max"]
+    if low is None:
+        return []
+    if low == high:
+        return [{"min": low, "max": high, "count": totals["total"]}]
+
+    width = ((high - low) / buckets).quantize(Decimal("0.000001"))
+    bucket = Least(
+        Cast(Floor((F(price_field) - Value(low)) / Value(width)), IntegerField()),
+        Value(buckets - 1),
+    )
+    counts = dict(
+        queryset.annotate(bucket=bucket)
+        .values("bucket")
+        .annotate(count=Count("id"))
+        .values_list("bucket", "count")
+    )
+    return [
+        {
+            "min": (low + width * i).quantize(CENT),
+            "max": (low + width * (i + 1)).quantize(CENT) if i < buckets - 1 else high,
+            "count": counts.get(i, 0),
+        }
+        for i in range(buckets)
+    ]
@@ -1,14 +1,36 @@
 import django_filters
-from Shop.models import Product, Stars
+from Shop.models import Order, Product, Stars
+from Shop.search import search_products
 
 
 class ProductFilter(django_filters.FilterSet):
-    price_min = django_filters.NumberFilter(field_name="price", lookup_expr="gte")
-    price_max = django_filters.NumberFilter(field_name="price", lookup_expr="lte")
+    price_min = django_filters.NumberFilter(field_name="effective_price", lookup_expr="gte")
+    price_max = django_filters.NumberFilter(field_name="effective_price", lookup_expr="lte")
+    search = django_filters.CharFilter(method="filter_search")
 
     class Meta:
         model = Product
         fields = {
             "category": ["exact"],
             "price": ["gte", "lte"],
-        }
\ No newline at end of file
+        }
+
+    def filter_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_products(queryset, value)
+
+
+class OrderFilter(django_filters.FilterSet):
+    # Plain id lookups, so filtering does not load the user row to validate it.
+    user = django_filters.UUIDFilter(field_name="user_id")
+    created_after = django_filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="gte"
+    )
+    created_before = django_filters.IsoDateTimeFilter(
+        field_name="created_at", lookup_expr="lt"
+    )
+
+    class Meta:
+        model = Order
+        fields = ["status", "paid"]
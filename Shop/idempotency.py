@@ -0,0 +1,94 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+from rest_framework import status
+from rest_framework.response import Response
+
+from Shop.cache import LockBusy, cache_lock
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# An in-flight duplicate waits this long for the first request to finish
+# before it is turned away with 409.
+LOCK_WAIT = 5.0
+LOCK_TIMEOUT = 60
+
+
+def _fingerprint(request):
+    # Keyed, because the body may hold a password and the digest sits in the
+    # cache for IDEMPOTENCY_TTL.
+    raw = json.dumps(request.data, sort_keys=True, default=str)
+    return salted_hmac(__name__, raw, algorithm="sha256").hexdigest()
+
+
+def _cache_key(request, key):
+    user = request.user
+    scope = f"user:{user.pk}" if user.is_authenticated else "anon"
+    raw = "\n".join((scope, request.method, request.path, key))
+    return f"idempotency:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def _replay(stored):
+    response = Response(stored["data"], status=stored["status"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(handler):
+    """
+    Honor an ``Idempotency-Key`` header on a view handler.
+
+    The first completed response for a (user, endpoint, key) is kept for
+    ``IDEMPOTENCY_TTL`` seconds and replayed for repeats without calling the
+    handler again, whatever its status code. Reusing a key with a different
+    body is rejected with 422. Requests that raise are not stored, so they
+    can be retried; a handler that has committed work must therefore return
+    its error response rather than raise it.
+    """
+
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"message": f"{HEADER} is too long"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache_key = _cache_key(request, key)
+        fingerprint = _fingerprint(request)
+        try:
+            with cache_lock(f"{cache_key}:lock", LOCK_TIMEOUT, LOCK_WAIT):
+                stored = cache.get(cache_key)
+                if stored is None:
+                    response = handler(self, request, *args, **kwargs)
+                    cache.set(
+                        cache_key,
+                        {
+                            "fingerprint": fingerprint,
+                            "status": response.status_code,
+                            "data": response.data,
+                        },
+                        timeout=settings.IDEMPOTENCY_TTL,
+                    )
+                    return response
+        except LockBusy:
+            return Response(
+                {"message": "A request with this idempotency key is in progress"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        if stored["fingerprint"] != fingerprint:
+            return Response(
+                {"message": f"{HEADER} was already used with a different request"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return _replay(stored)
+
+    return wrapper
@@ -0,0 +1,73 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+QUALITY = 80
+
+
+def variant_path(name, width, ext):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, "variants", f"{stem}_{width}.{ext}")
+
+
+def build_variants(fieldfile, widths=None):
+    """
+    Write WebP and JPEG copies of ``fieldfile`` at each width that is not
+    larger than the original, and return ``{width: {format: storage path}}``.
+    """
+    widths = sorted(widths or settings.IMAGE_VARIANT_WIDTHS)
+
+    with fieldfile.open("rb") as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    targets = [w for w in widths if w < image.width] or [image.width]
+    variants = {}
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        variants[str(width)] = {}
+        for ext, fmt in FORMATS.items():
+            frame = resized.convert("RGB") if fmt == "JPEG" else resized
+            buffer = io.BytesIO()
+            frame.save(buffer, fmt, quality=QUALITY, optimize=True)
+            path = variant_path(fieldfile.name, width, ext)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            variants[str(width)][ext] = default_storage.save(
+                path, ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def variant_paths(variants):
+    return {path for formats in (variants or {}).values() for path in formats.values()}
+
+
+def delete_variants(variants, keep=()):
+    for path in variant_paths(variants) - set(keep):
+        default_storage.delete(path)
+
+
+def variant_urls(variants, request=None):
+    """``{"200w": {"webp": url, "jpeg": url}}`` for serializers."""
+    urls = {}
+    for width, formats in sorted((variants or {}).items(), key=lambda i: int(i[0])):
+        urls[f"{width}w"] = {
+            ext: (
+                request.build_absolute_uri(default_storage.url(path))
+                if request
+                else default_storage.url(path)
+            )
+            for ext, path in formats.items()
+        }
+    return urls
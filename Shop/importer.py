@@ -0,0 +1,210 @@
+import csv
+import hashlib
+import io
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+
+from Shop.cache import bump_catalog_version
+from Shop.models import Category, Product
+from Shop.search import get_search_backend
+from Shop.serializers import ProductImportRowSerializer
+
+FORMATS = ("csv", "jsonl")
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+# ``stock`` only seeds new products. Once a product exists its stock is the
+# live count that cart reservations and orders move, and overwriting it with
+# the feed's absolute figure would hand reserved units out a second time when
+# those reservations expire. Restocks of existing products are done by staff.
+UPDATE_FIELDS = [
+    "name",
+    "description",
+    "price",
+    "discount_percent",
+    "category",
+    "content_hash",
+    "updated_at",
+]
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    errors: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "invalid": self.invalid,
+            "errors": self.errors,
+        }
+
+
+def detect_format(filename, default="csv"):
+    for fmt in FORMATS:
+        if filename and filename.lower().endswith(f".{fmt}"):
+            return fmt
+    return default
+
+
+def iter_rows(stream, fmt):
+    """Yield (line number, row dict) pairs without reading the whole file."""
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_num, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_num, row if isinstance(row, dict) else {"__invalid__": line}
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def content_hash(data, category_id):
+    raw = json.dumps(
+        [
+            data["name"],
+            data["description"],
+            str(data["price"]),
+            data["discount_percent"],
+            str(category_id or ""),
+        ]
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class ProductImporter:
+    """
+    Upserts products keyed on ``sku`` from a CSV/JSONL stream.
+
+    Rows are validated and written a chunk at a time: one lookup of existing
+    hashes, one bulk category insert and one ``INSERT ... ON CONFLICT DO
+    UPDATE`` per chunk. Rows whose content hash has not changed are skipped;
+    the hash leaves out ``stock``, which is never updated (see
+    ``UPDATE_FIELDS``).
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.stats = ImportStats()
+        self._categories = {}
+
+    def run(self, stream, fmt):
+        rows = iter_rows(stream, fmt)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+            if self.progress:
+                self.progress(self.stats)
+
+        if self.stats.created or self.stats.updated:
+            bump_catalog_version()
+        return self.stats
+
+    def import_chunk(self, chunk):
+        self.stats.rows += len(chunk)
+
+        rows = {}
+        for line_num, row in chunk:
+            data = self.validate(line_num, row)
+            if data is not None:
+                rows[data["sku"]] = data
+
+        if not rows:
+            return
+
+        with transaction.atomic():
+            category_ids = self.resolve_categories(
+                {data["category"] for data in rows.values() if data.get("category")}
+            )
+            existing = dict(
+                Product.objects.filter(sku__in=rows).values_list("sku", "content_hash")
+            )
+
+            products = []
+            for sku, data in rows.items():
+                category_id = category_ids.get(data.get("category"))
+                digest = content_hash(data, category_id)
+                if existing.get(sku) == digest:
+                    self.stats.unchanged += 1
+                    continue
+                if sku in existing:
+                    self.stats.updated += 1
+                else:
+                    self.stats.created += 1
+                products.append(
+                    Product(
+                        sku=sku,
+                        name=data["name"],
+                        description=data["description"],
+                        price=data["price"],
+                        stock=data["stock"],
+                        discount_percent=data["discount_percent"],
+                        category_id=category_id,
+                        content_hash=digest,
+                    )
+                )
+
+            if not products:
+                return
+
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=["sku"],
+                update_fields=UPDATE_FIELDS,
+            )
+            get_search_backend().index_many(
+                Product.objects.filter(sku__in=[p.sku for p in products]).values("id")
+            )
+
+    def validate(self, line_num, row):
+        if row is None or "__invalid__" in row:
+            self.add_error(line_num, {"row": ["Malformed row."]})
+            return None
+
+        row = {key: value for key, value in row.items() if key and value not in ("", None)}
+        serializer = ProductImportRowSerializer(data=row)
+        if not serializer.is_valid():
+            self.add_error(line_num, serializer.errors)
+            return None
+        return serializer.validated_data
+
+    def add_error(self, line_num, errors):
+        self.stats.invalid += 1
+        if len(self.stats.errors) < MAX_REPORTED_ERRORS:
+            self.stats.errors.append({"line": line_num, "errors": errors})
+
+    def resolve_categories(self, names):
+        missing = names - self._categories.keys()
+        if missing:
+            for category in Category.objects.filter(name__in=missing).order_by("name"):
+                self._categories.setdefault(category.name, category.id)
+            new = [Category(name=name) for name in missing - self._categories.keys()]
+            for category in Category.objects.bulk_create(new):
+                self._categories[category.name] = category.id
+        return {name: self._categories[name] for name in names}
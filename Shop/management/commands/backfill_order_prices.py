@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from Shop.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot line prices and store totals for orders created before "
+        "prices were recorded at checkout (uses current product prices)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        pending = Order.objects.filter(total_amount__isnull=True).order_by("created_at")
+        updated = 0
+        while True:
+            ids = list(pending.values_list("id", flat=True)[: options["batch_size"]])
+            if not ids:
+                break
+            updated += Order.objects.filter(id__in=ids).snapshot_prices()
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled prices for {updated} orders."))
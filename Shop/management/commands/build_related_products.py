@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from Shop.recommendations import CHUNK_SIZE, build_related_products
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "frequently bought together" index from orders and carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=None)
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        created = build_related_products(
+            top_k=options["top_k"], chunk_size=options["chunk_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Stored {created} related product pairs."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Shop.importer import DEFAULT_CHUNK_SIZE, FORMATS, ProductImporter, detect_format
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV/JSONL supplier feed into the catalog, upserting on sku"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or detect_format(path)
+
+        def progress(stats):
+            self.stdout.write(
+                f"{stats.rows} rows: {stats.created} created, {stats.updated} updated, "
+                f"{stats.unchanged} unchanged, {stats.invalid} invalid"
+            )
+
+        importer = ProductImporter(chunk_size=options["chunk_size"], progress=progress)
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as stream:
+                stats = importer.run(stream, fmt)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in stats.errors:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+
+        self.stdout.write(self.style.SUCCESS(f"Import finished: {stats.rows} rows."))
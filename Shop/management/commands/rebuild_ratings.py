@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, DecimalField, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from Shop.models import Product, Stars
+
+
+class Command(BaseCommand):
+    help = "Recalculate rating_sum, rating_count and rating_avg for every product"
+
+    def handle(self, *args, **kwargs):
+        stars = (
+            Stars.objects.filter(product=OuterRef("pk"))
+            .order_by()
+            .values("product")
+        )
+
+        updated = Product.objects.update(
+            rating_sum=Coalesce(
+                Subquery(stars.annotate(s=Sum("grade")).values("s")),
+                0,
+                output_field=IntegerField(),
+            ),
+            rating_count=Coalesce(
+                Subquery(stars.annotate(c=Count("id")).values("c")),
+                0,
+                output_field=IntegerField(),
+            ),
+            rating_avg=Coalesce(
+                Subquery(
+                    stars.annotate(a=Avg("grade")).values("a"),
+                    output_field=DecimalField(max_digits=3, decimal_places=2),
+                ),
+                0,
+                output_field=DecimalField(max_digits=3, decimal_places=2),
+            ),
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Ratings rebuilt for {updated} products."))
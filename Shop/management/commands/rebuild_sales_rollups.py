@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from Shop.analytics import REBUILD_BATCH_SIZE, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups from paid orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            default=None,
+            help="Only rebuild days from this date (YYYY-MM-DD) onwards",
+        )
+        parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(
+            since=options["since"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Stored {written} product-day rows."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from Shop.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product full-text search index"
+
+    def handle(self, *args, **kwargs):
+        backend = get_search_backend()
+        indexed = backend.rebuild()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Search index rebuilt for {indexed} products "
+                f"({type(backend).__name__})."
+            )
+        )
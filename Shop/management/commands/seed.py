@@ -79,6 +79,7 @@ class Command(BaseCommand):
                 OrderedProduct.objects.create(
                     order=order, product=p, quantity=random.randint(1, 5)
                 )
+        Order.objects.snapshot_prices()
 
         self.stdout.write(
             self.style.SUCCESS("Seeding completed! 50 users and 150 products created.")
@@ -1,11 +1,34 @@
 import uuid
+from collections import defaultdict
 from decimal import Decimal
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core import validators
-from django.db import models, transaction
-from django.db.models import EmailField, ForeignKey, Model, UUIDField
+from django.db import IntegrityError, models, transaction
+from django.db.models import (
+    Case,
+    DecimalField,
+    EmailField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    ForeignKey,
+    Model,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    UUIDField,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, Now, Round
+from django.utils import timezone
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
 
 
 class UUIDModel(Model):
@@ -15,6 +38,56 @@ class UUIDModel(Model):
         abstract = True
 
 
+def line_totals(prefix=""):
+    """
+    Aggregates for a set of cart/order lines: ``total_amount`` (quantity x
+    discounted unit price, in numeric arithmetic) and ``item_count``.
+    """
+    return {
+        "total_amount": Coalesce(
+            Sum(
+                F(f"{prefix}quantity") * F(f"{prefix}product__effective_price"),
+                output_field=MONEY,
+            ),
+            Value(Decimal("0.00")),
+            output_field=MONEY,
+        ),
+        "item_count": Coalesce(Sum(f"{prefix}quantity"), Value(0)),
+    }
+
+
+class LineTotalsQuerySet(models.QuerySet):
+    def with_totals(self):
+        return self.annotate(**line_totals(f"{self.model.lines_relation}__"))
+
+
+class LineTotalsMixin:
+    """
+    Totals of the ``lines_relation`` lines: read from the ``with_totals()``
+    annotation when present, otherwise computed with one aggregate query.
+    """
+
+    lines_relation = None
+
+    def totals(self):
+        if hasattr(self, "total_amount"):
+            return {"total_amount": self.total_amount, "item_count": self.item_count}
+        return getattr(self, self.lines_relation).aggregate(**line_totals())
+
+    @property
+    def total_price(self):
+        return self.totals()["total_amount"]
+
+
+class SearchVectorIndex(GinIndex):
+    """GIN index on Postgres, a plain index elsewhere so SQLite can still migrate."""
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor != "postgresql":
+            return models.Index.create_sql(self, model, schema_editor, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+
 class User(AbstractUser, UUIDModel):
     username = models.CharField(unique=True, max_length=150, null=True, blank=True)
     email = EmailField(unique=True)
@@ -24,29 +97,62 @@ class User(AbstractUser, UUIDModel):
     REQUIRED_FIELDS = ["phone"]
 
 
-class Profile(UUIDModel):
+class ImageVariantsMixin:
+    """Queues resized variants of ``image_field`` whenever a new file is saved."""
+
+    image_field = "image"
+    variants_field = "image_variants"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_image = instance._image_name()
+        return instance
+
+    def _image_name(self):
+        value = self.__dict__.get(self.image_field)
+        return getattr(value, "name", value) or None
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        name = self._image_name()
+        if name != getattr(self, "_saved_image", None):
+            from Shop.tasks import generate_image_variants
+
+            label, pk = self._meta.label, str(self.pk)
+            transaction.on_commit(lambda: generate_image_variants.delay(label, pk))
+            self._saved_image = name
+
+
+class Profile(ImageVariantsMixin, UUIDModel):
     user: "User" = models.OneToOneField(
         settings.AUTH_USER_MODEL, related_name="profile", on_delete=models.CASCADE
     )
     img = models.ImageField(upload_to="profile", blank=True, null=True)
+    img_variants = models.JSONField(default=dict, blank=True, editable=False)
     reset_code = models.CharField(max_length=256, blank=True, null=True)
     reset_code_created_at = models.DateTimeField(null=True, blank=True)
 
+    image_field = "img"
+    variants_field = "img_variants"
+
     def __str__(self):
         return f"{self.user.username}: {self.user.phone}"
 
 
 class Category(UUIDModel):
     name = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
 
 
-class Product(UUIDModel):
+class Product(ImageVariantsMixin, UUIDModel):
     category = models.ForeignKey(
         Category, on_delete=models.SET_NULL, null=True, related_name="products"
     )
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=100)
     description = models.TextField(
         validators=[
@@ -55,12 +161,25 @@ class Product(UUIDModel):
         ]
     )
     image = models.ImageField(upload_to="products", blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     price = models.DecimalField(max_digits=12, decimal_places=2)
     stock = models.PositiveIntegerField(default=1)
     discount_percent = models.IntegerField(
         default=0,
         validators=[validators.MinValueValidator(0), validators.MaxValueValidator(100)],
     )
+    effective_price = models.GeneratedField(
+        # Rounded explicitly: SQLite does not apply the column's scale, and
+        # line totals multiply the stored per-unit value.
+        expression=Round(
+            F("price")
+            * (Value(Decimal("100.0")) - F("discount_percent"))
+            / Value(Decimal("100.0")),
+            2,
+        ),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True,
+    )
 
     flash = ForeignKey(
         "FlashSales",
@@ -70,64 +189,237 @@ class Product(UUIDModel):
         related_name="products",
     )
 
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    content_hash = models.CharField(max_length=40, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-rating_sum", "id"], name="product_rating_sum_idx"),
+            models.Index(fields=["effective_price", "id"], name="product_eff_price_idx"),
+            models.Index(
+                fields=["category", "effective_price", "id"],
+                name="product_cat_eff_price_idx",
+            ),
+            SearchVectorIndex(fields=["search_vector"], name="product_search_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._indexed_text = instance._search_text()
+        return instance
+
+    def _search_text(self):
+        return self.__dict__.get("name"), self.__dict__.get("description")
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self._search_text() != getattr(self, "_indexed_text", None):
+            from Shop.search import get_search_backend
+
+            get_search_backend().index(self)
+            self._indexed_text = self._search_text()
+
     def get_total_price(self):
         return self.price * (Decimal(1) - Decimal(self.discount_percent) / Decimal(100))
 
+    @classmethod
+    def reserve_stock(cls, product_id, quantity):
+        """Take ``quantity`` units if available; one conditional UPDATE."""
+        return bool(
+            cls.objects.filter(pk=product_id, stock__gte=quantity).update(
+                stock=F("stock") - quantity, updated_at=Now()
+            )
+        )
+
+    @classmethod
+    def release_stock(cls, product_id, quantity):
+        return cls.objects.filter(pk=product_id).update(
+            stock=F("stock") + quantity, updated_at=Now()
+        )
+
+    @classmethod
+    def shift_rating(cls, product_id, grade, count=1):
+        """Add (count=1) or remove (count=-1) a single grade in one UPDATE."""
+        new_sum = F("rating_sum") + grade * count
+        new_count = F("rating_count") + count
+        return cls.objects.filter(pk=product_id).update(
+            updated_at=Now(),
+            rating_sum=new_sum,
+            rating_count=new_count,
+            rating_avg=Case(
+                When(rating_count__lte=-count, then=Value(Decimal(0))),
+                default=Cast(new_sum, FloatField()) / new_count,
+                output_field=DecimalField(max_digits=3, decimal_places=2),
+            ),
+        )
+
     def __str__(self):
         return self.name
 
 
-class Card(UUIDModel):
+class Card(LineTotalsMixin, UUIDModel):
     user: "User" = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="card",
     )
 
-    @property
-    def total_price(self):
-        return sum(item.total_price for item in self.card_products.all())
+    objects = LineTotalsQuerySet.as_manager()
+    lines_relation = "card_products"
 
     def to_card(self, product, quantity=1):
+        """
+        Reserve ``quantity`` units and add them to the card.
 
-        if product.stock < quantity:
-            return False
-
+        The stock check and decrement are a single conditional UPDATE, so
+        concurrent requests can never take stock below zero.
+        """
         with transaction.atomic():
-            product.stock -= quantity
-            product.save()
+            if not Product.reserve_stock(product.pk, quantity):
+                return False
+
+            lines = CardProduct.objects.filter(card=self, product=product)
+            refreshed = lines.update(quantity=F("quantity") + quantity, reserved_at=Now())
+            if not refreshed:
+                try:
+                    with transaction.atomic():
+                        CardProduct.objects.create(
+                            card=self, product=product, quantity=quantity
+                        )
+                except IntegrityError:
+                    # Another request created the line first.
+                    lines.update(quantity=F("quantity") + quantity, reserved_at=Now())
+
+        product.stock -= quantity
+        return True
 
-            card_product, created = CardProduct.objects.get_or_create(
-                card=self, product=product
+    def remove_card(self, product, quantity=None):
+        with transaction.atomic():
+            line = (
+                CardProduct.objects.select_for_update()
+                .filter(card=self, product=product)
+                .values_list("pk", "quantity")
+                .first()
             )
+            if line is None:
+                return False
 
-            if created:
-                card_product.quantity = quantity
+            pk, in_card = line
+            if quantity is None or quantity >= in_card:
+                quantity = in_card
+                CardProduct.objects.filter(pk=pk).delete()
             else:
-                card_product.quantity += quantity
+                CardProduct.objects.filter(pk=pk).update(quantity=F("quantity") - quantity)
 
-            card_product.save()
+            Product.release_stock(product.pk, quantity)
 
+        product.stock += quantity
         return True
 
-    def remove_card(self, product, quantity=None):
-        try:
-            card_product = CardProduct.objects.get(card=self, product=product)
-        except CardProduct.DoesNotExist:
-            return False
-
+    def apply_operations(self, operations):
+        """
+        Apply ``{"action", "product_id", "quantity"}`` items in one transaction.
+
+        Products and existing lines are locked with one query each, every
+        item is checked against the running quantities, and the outcome is
+        written back with a single stock UPDATE, an upsert of the lines that
+        grew, an UPDATE of the ones that shrank and one delete. Returns one
+        result dict per item, in order.
+        """
+        product_ids = {op["product_id"] for op in operations}
         with transaction.atomic():
-            if quantity is None or quantity >= card_product.quantity:
-                product.stock += card_product.quantity
-                card_product.delete()
-            else:
-                card_product.quantity -= quantity
-                product.stock += quantity
-                card_product.save()
-
-            product.save()
-
-        return True
+            stock = dict(
+                Product.objects.select_for_update()
+                .filter(id__in=product_ids)
+                .order_by("id")
+                .values_list("id", "stock")
+            )
+            initial = dict(
+                CardProduct.objects.select_for_update()
+                .filter(card=self, product_id__in=stock)
+                .values_list("product_id", "quantity")
+            )
+            quantities = dict(initial)
+
+            results = []
+            for op in operations:
+                pid, action, amount = op["product_id"], op["action"], op.get("quantity")
+                in_card = quantities.get(pid, 0)
+                if pid not in stock:
+                    status = "product_not_found"
+                elif action == "remove" and not in_card:
+                    status = "not_in_card"
+                else:
+                    if action == "add":
+                        target = in_card + amount
+                    elif action == "set":
+                        target = amount
+                    else:
+                        target = 0 if amount is None else max(in_card - amount, 0)
+
+                    if target - in_card > stock[pid]:
+                        status = "insufficient_stock"
+                    else:
+                        status = "ok"
+                        stock[pid] -= target - in_card
+                        quantities[pid] = in_card = target
+                results.append(
+                    {
+                        "product_id": pid,
+                        "action": action,
+                        "status": status,
+                        "quantity": in_card,
+                    }
+                )
+
+            deltas = {
+                pid: qty - initial.get(pid, 0)
+                for pid, qty in quantities.items()
+                if qty != initial.get(pid, 0)
+            }
+            if deltas:
+                Product.objects.filter(id__in=deltas).update(
+                    stock=Case(
+                        *(
+                            When(id=pid, then=F("stock") - delta)
+                            for pid, delta in deltas.items()
+                        )
+                    ),
+                    updated_at=Now(),
+                )
+                # Only a line that grew starts a new reservation period.
+                CardProduct.objects.bulk_create(
+                    [
+                        CardProduct(card=self, product_id=pid, quantity=quantities[pid])
+                        for pid, delta in deltas.items()
+                        if delta > 0
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["card", "product"],
+                    update_fields=["quantity", "reserved_at"],
+                )
+                shrunk = {
+                    pid: quantities[pid]
+                    for pid, delta in deltas.items()
+                    if delta < 0 and quantities[pid]
+                }
+                if shrunk:
+                    CardProduct.objects.filter(card=self, product_id__in=shrunk).update(
+                        quantity=Case(
+                            *(When(product_id=pid, then=qty) for pid, qty in shrunk.items())
+                        )
+                    )
+                CardProduct.objects.filter(
+                    card=self, product_id__in=[pid for pid in deltas if not quantities[pid]]
+                ).delete()
+
+        return results
 
     def __str__(self):
         return f"{self.user.username}'s Card"
@@ -139,10 +431,19 @@ class CardProduct(UUIDModel):
     )
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # Stock is held for this line until reserved_at + CART_RESERVATION_TTL.
+    reserved_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["card", "product"], name="card_product_unique"
+            )
+        ]
 
     @property
     def total_price(self):
-        return self.product.get_total_price() * self.quantity
+        return self.product.effective_price * self.quantity
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity}"
@@ -159,17 +460,124 @@ class Transaction(models.Model):
     status = models.CharField(max_length=50)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["stripe_payment_intent"], name="transaction_intent_idx"),
+            models.Index(fields=["created_at", "id"], name="transaction_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.amount} {self.currency} - {self.status}"
 
 
-class Order(UUIDModel):
+class PaymentOutbox(UUIDModel):
+    """
+    A payment intent still owed to an order. Written in the checkout
+    transaction and worked off after commit, so the gateway call never runs
+    inside it. The row id is the gateway idempotency key.
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    order = models.OneToOneField(
+        "Shop.Order", on_delete=models.CASCADE, related_name="payment_outbox"
+    )
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    currency = models.CharField(max_length=10, default="usd")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Handed to the buyer by the order payment endpoint once the intent exists.
+    client_secret = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["updated_at"],
+                condition=Q(status="pending"),
+                name="payment_outbox_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} - {self.amount} {self.currency} - {self.status}"
+
+
+class OrderQuerySet(models.QuerySet):
+    def snapshot_prices(self):
+        """
+        Copy the live unit price, discount and line total onto lines of these
+        orders that have no snapshot yet, then store each order's totals from
+        its lines. Returns the number of orders updated.
+        """
+        product = Product.objects.filter(pk=OuterRef("product_id"))
+        OrderedProduct.objects.filter(order__in=self, unit_price__isnull=True).update(
+            unit_price=Subquery(product.values("price")),
+            discount_percent=Subquery(product.values("discount_percent")),
+            line_total=ExpressionWrapper(
+                F("quantity") * Subquery(product.values("effective_price")),
+                output_field=MONEY,
+            ),
+        )
+
+        lines = OrderedProduct.objects.filter(order=OuterRef("pk")).order_by().values(
+            "order"
+        )
+        return self.update(
+            total_amount=Coalesce(
+                Subquery(lines.annotate(s=Sum("line_total")).values("s")),
+                Value(Decimal("0.00")),
+                output_field=MONEY,
+            ),
+            item_count=Coalesce(
+                Subquery(lines.annotate(c=Sum("quantity")).values("c")), Value(0)
+            ),
+        )
+
+    def set_status(self, status):
+        """
+        Move the selected orders to ``status`` with one UPDATE per current
+        status that allows it. Rows are locked first, so call this inside a
+        transaction. Returns ``({old_status: [ids]}, rejected_ids)``.
+        """
+        current = defaultdict(list)
+        rows = self.select_for_update().order_by("id").values_list("id", "status")
+        for pk, old in rows:
+            current[old].append(pk)
+
+        changed, rejected = {}, []
+        now = timezone.now()
+        for old, ids in current.items():
+            if status in self.model.TRANSITIONS.get(old, ()):
+                self.model.objects.filter(id__in=ids, status=old).update(
+                    status=status, updated_at=now
+                )
+                changed[old] = ids
+            else:
+                rejected += ids
+        return changed, rejected
+
+
+class Order(LineTotalsMixin, UUIDModel):
     STATUS_CHOICES = [
         ("pending", "Kutilmoqda"),
         ("shipped", "Yuborilgan"),
         ("delivered", "Yetkazilgan"),
         ("canceled", "Bekor qilingan"),
     ]
+    # Status changes staff may make; delivered and canceled are final.
+    TRANSITIONS = {
+        "pending": {"shipped", "canceled"},
+        "shipped": {"delivered", "canceled"},
+        "delivered": set(),
+        "canceled": set(),
+    }
 
     user: "User" = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -183,14 +591,44 @@ class Order(UUIDModel):
     latitude = models.FloatField()
     longitude = models.FloatField()
     paid = models.BooleanField(default=False)
+    paid_at = models.DateTimeField(null=True, blank=True)
     stripe_payment_intent = models.CharField(max_length=255, blank=True, null=True)
 
+    # Stored at checkout from the line snapshots; null for orders that have
+    # not been backfilled, which fall back to live prices.
+    total_amount = models.DecimalField(
+        max_digits=14, decimal_places=2, null=True, blank=True
+    )
+    item_count = models.PositiveIntegerField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    @property
-    def total_price(self):
-        return sum(item.total_price for item in self.products.all())
+    objects = OrderQuerySet.as_manager()
+    lines_relation = "products"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["stripe_payment_intent"],
+                condition=Q(stripe_payment_intent__isnull=False),
+                name="order_intent_idx",
+            ),
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+            models.Index(fields=["-created_at", "id"], name="order_created_idx"),
+            # Staff order list filtered by status / paid, newest first.
+            models.Index(
+                fields=["status", "-created_at", "id"], name="order_status_created_idx"
+            ),
+            models.Index(
+                fields=["paid", "-created_at", "id"], name="order_paid_created_idx"
+            ),
+        ]
+
+    def totals(self):
+        if self.total_amount is None:
+            return self.products.aggregate(**line_totals())
+        return super().totals()
 
     def __str__(self):
         return f"{self.user.username} - {self.status}"
@@ -200,10 +638,20 @@ class OrderedProduct(UUIDModel):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="products")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # Prices at checkout, so later price changes do not rewrite the order.
+    unit_price = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True
+    )
+    discount_percent = models.IntegerField(null=True, blank=True)
+    line_total = models.DecimalField(
+        max_digits=14, decimal_places=2, null=True, blank=True
+    )
 
     @property
     def total_price(self):
-        return self.quantity * self.product.get_total_price()
+        if self.line_total is not None:
+            return self.line_total
+        return self.quantity * self.product.effective_price
 
     def __str__(self):
         return f"{self.product} - {self.quantity}"
@@ -212,6 +660,7 @@ class OrderedProduct(UUIDModel):
 class FlashSales(UUIDModel):
     start_at = models.DateTimeField()
     end_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def clear_discount_percent(self, session):
         with session as _:
@@ -247,6 +696,94 @@ class Stars(UUIDModel):
 
     class Meta:
         unique_together = ("user", "product")
+        indexes = [
+            models.Index(
+                fields=["product", "-created_at", "id"], name="stars_product_created_idx"
+            ),
+            models.Index(
+                fields=["user", "-created_at", "id"], name="stars_user_created_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} appreciated {self.product.name}"
+
+class RelatedProduct(models.Model):
+    """Precomputed "frequently bought together" pairs, top-K per product."""
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="related_products"
+    )
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "related"], name="related_product_unique"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["product", "-score", "related"], name="related_product_score_idx"
+            )
+        ]
 
     def __str__(self):
-        return f"{self.user.username} appreciated {self.product.name}"
\ No newline at end of file
+        return f"{self.product_id} -> {self.related_id} ({self.score})"
+
+
+class SalesRollup(models.Model):
+    """
+    Daily sales counters, added to as orders are paid. Product and category
+    keys carry no database constraint and the name is copied at sale time,
+    so deleting either keeps its sales history.
+    """
+
+    day = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class SalesDaily(SalesRollup):
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["day"], name="sales_daily_unique")]
+
+
+class ProductSalesDaily(SalesRollup):
+    product = models.ForeignKey(
+        Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    product_name = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "product"], name="product_sales_daily_unique"
+            )
+        ]
+
+
+class CategorySalesDaily(SalesRollup):
+    # Null collects products without a category.
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+    )
+    category_name = models.CharField(max_length=100, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "category"],
+                name="category_sales_daily_unique",
+                nulls_distinct=False,
+            )
+        ]
\ No newline at end of file
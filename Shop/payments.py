@@ -0,0 +1,166 @@
+import logging
+import math
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from Shop.models import Order, PaymentOutbox, Transaction
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PaymentIntent:
+    id: str
+    client_secret: str
+    status: str
+
+
+class PaymentGatewayError(Exception):
+    """The gateway could not be reached or refused to create the intent."""
+
+
+class StripeGateway:
+    """
+    Stripe PaymentIntents with a bounded request timeout. Network retries are
+    left to the Stripe client, which is safe because every call carries an
+    idempotency key.
+    """
+
+    def __init__(self, timeout, max_retries):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.http_client = stripe.new_default_http_client(timeout=timeout)
+
+    def create_intent(self, amount, currency, metadata, idempotency_key):
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        stripe.max_network_retries = self.max_retries
+        stripe.default_http_client = self.http_client
+        try:
+            intent = stripe.PaymentIntent.create(
+                amount=amount,
+                currency=currency,
+                payment_method_types=["card"],
+                capture_method="automatic",
+                metadata=metadata,
+                idempotency_key=idempotency_key,
+            )
+        except stripe.error.StripeError as exc:
+            raise PaymentGatewayError(str(exc)) from exc
+        return PaymentIntent(intent.id, intent.client_secret, intent.status)
+
+
+class FakeGateway:
+    """
+    Offline stand-in for load tests and local runs. Intents are kept in
+    memory per process; ``latency`` seconds are slept on every new intent to
+    mimic the gateway round-trip.
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.intents = {}
+
+    def create_intent(self, amount, currency, metadata, idempotency_key):
+        if idempotency_key not in self.intents:
+            if self.latency:
+                time.sleep(self.latency)
+            token = uuid.uuid4().hex
+            self.intents[idempotency_key] = PaymentIntent(
+                f"pi_fake_{token}",
+                f"pi_fake_{token}_secret_fake",
+                "requires_payment_method",
+            )
+        return self.intents[idempotency_key]
+
+
+_gateways = {}
+
+
+def get_gateway():
+    name = settings.PAYMENT_GATEWAY
+    if name not in _gateways:
+        if name == "fake":
+            _gateways[name] = FakeGateway(latency=settings.PAYMENT_FAKE_LATENCY)
+        else:
+            _gateways[name] = StripeGateway(
+                timeout=settings.PAYMENT_GATEWAY_TIMEOUT,
+                max_retries=settings.PAYMENT_GATEWAY_RETRIES,
+            )
+    return _gateways[name]
+
+
+def create_payment_intent(outbox_id):
+    """
+    Create the intent owed by an outbox row and record it on the order.
+
+    Runs outside any transaction so the gateway round-trip holds no
+    connection or row locks. Calling it again for the same row, e.g. from the
+    retry task racing a checkout request, gets the same intent back from the
+    gateway and records it only once. A failed attempt is counted on the row
+    and re-raised as ``PaymentGatewayError``.
+    """
+    outbox = PaymentOutbox.objects.select_related("order").get(id=outbox_id)
+    order = outbox.order
+    try:
+        intent = get_gateway().create_intent(
+            amount=math.ceil(outbox.amount * 100),
+            currency=outbox.currency,
+            metadata={"order_id": order.id},
+            idempotency_key=str(outbox.id),
+        )
+    except PaymentGatewayError as exc:
+        PaymentOutbox.objects.filter(id=outbox.id, status="pending").update(
+            attempts=F("attempts") + 1, last_error=str(exc), updated_at=timezone.now()
+        )
+        PaymentOutbox.objects.filter(
+            id=outbox.id, status="pending", attempts__gte=settings.PAYMENT_MAX_ATTEMPTS
+        ).update(status="failed")
+        raise
+
+    with transaction.atomic():
+        claimed = PaymentOutbox.objects.filter(id=outbox.id, status="pending").update(
+            status="done",
+            attempts=F("attempts") + 1,
+            client_secret=intent.client_secret,
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            Transaction.objects.create(
+                user_id=order.user_id,
+                order=order,
+                stripe_payment_intent=intent.id,
+                amount=outbox.amount,
+                currency=outbox.currency,
+                status=intent.status,
+            )
+            Order.objects.filter(id=order.id).update(
+                stripe_payment_intent=intent.id, updated_at=timezone.now()
+            )
+    return intent
+
+
+def retry_pending_intents(limit=100):
+    """Retry outbox rows whose last attempt is older than PAYMENT_RETRY_DELAY."""
+    cutoff = timezone.now() - timedelta(seconds=settings.PAYMENT_RETRY_DELAY)
+    ids = list(
+        PaymentOutbox.objects.filter(status="pending", updated_at__lt=cutoff)
+        .order_by("updated_at")
+        .values_list("id", flat=True)[:limit]
+    )
+    created = 0
+    for outbox_id in ids:
+        try:
+            create_payment_intent(outbox_id)
+        except PaymentGatewayError as exc:
+            logger.warning("Payment intent for outbox %s failed: %s", outbox_id, exc)
+        else:
+            created += 1
+    return created
@@ -0,0 +1,117 @@
+import heapq
+from array import array
+from collections import Counter
+from itertools import combinations, groupby, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+
+from Shop.models import CardProduct, OrderedProduct, RelatedProduct
+
+CHUNK_SIZE = 2000
+# Pairs grow quadratically with basket size; a bulk order of hundreds of
+# products says little about what is bought together.
+MAX_BASKET_SIZE = 50
+# Pair codes are buffered in a flat array and folded into the counter in
+# batches, which keeps the per-pair cost at one 8-byte slot until the flush.
+FLUSH_PAIRS = 1_000_000
+
+
+class CoPurchaseIndex:
+    """
+    Counts how often two products share an order or a cart.
+
+    Product ids are mapped to dense integers as they are first seen and a
+    pair ``(a, b)`` with ``a < b`` is stored as the single integer
+    ``a << 32 | b``, so the counter holds plain ints instead of UUID tuples.
+    """
+
+    def __init__(self, max_basket_size=MAX_BASKET_SIZE):
+        self.max_basket_size = max_basket_size
+        self.ids = []
+        self.index = {}
+        self.counts = Counter()
+        self.buffer = array("Q")
+        self.baskets = 0
+
+    def add_basket(self, product_ids):
+        codes = sorted({self._code(pid) for pid in product_ids})
+        if len(codes) < 2 or len(codes) > self.max_basket_size:
+            return
+        self.baskets += 1
+        self.buffer.extend(a << 32 | b for a, b in combinations(codes, 2))
+        if len(self.buffer) >= FLUSH_PAIRS:
+            self.flush()
+
+    def add_lines(self, rows):
+        """Consume ``(basket id, product id)`` rows sorted by basket id."""
+        for _, lines in groupby(rows, key=itemgetter(0)):
+            self.add_basket(product_id for _, product_id in lines)
+
+    def flush(self):
+        self.counts.update(self.buffer)
+        self.buffer = array("Q")
+
+    def top(self, k):
+        """Yield ``(product id, related id, score)`` for the top ``k`` per product."""
+        self.flush()
+        heaps = {}
+        for code, score in self.counts.items():
+            a, b = code >> 32, code & 0xFFFFFFFF
+            for product, related in ((a, b), (b, a)):
+                heap = heaps.setdefault(product, [])
+                # Ties are broken by id so rebuilds are deterministic.
+                item = (score, -related)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        for product, heap in heaps.items():
+            for score, negated in heap:
+                yield self.ids[product], self.ids[-negated], score
+
+    def _code(self, product_id):
+        code = self.index.get(product_id)
+        if code is None:
+            code = self.index[product_id] = len(self.ids)
+            self.ids.append(product_id)
+        return code
+
+
+def build_related_products(top_k=None, chunk_size=CHUNK_SIZE):
+    """
+    Rebuild ``RelatedProduct`` from order lines and cart contents.
+
+    Lines are streamed with ``.iterator()`` ordered by their basket, so memory
+    is bounded by the number of distinct pairs rather than by order volume.
+    Returns the number of rows written.
+    """
+    top_k = top_k or settings.RELATED_PRODUCTS_TOP_K
+    index = CoPurchaseIndex()
+    index.add_lines(
+        OrderedProduct.objects.order_by("order_id")
+        .values_list("order_id", "product_id")
+        .iterator(chunk_size=chunk_size)
+    )
+    index.add_lines(
+        CardProduct.objects.order_by("card_id")
+        .values_list("card_id", "product_id")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    rows = (
+        RelatedProduct(product_id=product, related_id=related, score=score)
+        for product, related, score in index.top(top_k)
+    )
+    with transaction.atomic():
+        RelatedProduct.objects.all().delete()
+        created = 0
+        while True:
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                break
+            RelatedProduct.objects.bulk_create(batch)
+            created += len(batch)
+    return created
@@ -0,0 +1,116 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, When
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from Shop.carts import CacheCart, CartBusy
+from Shop.models import Card, CardProduct, Product
+
+logger = logging.getLogger(__name__)
+
+
+def _release_batch_postgres(cutoff, batch_size):
+    """
+    One statement per batch: lock a slice of expired lines (skipping rows a
+    cart request holds), delete them and return their quantities to stock
+    with ``UPDATE ... FROM``. The released (user, product, quantity) rows are
+    returned so cached carts can be reconciled.
+    """
+    qn = connection.ops.quote_name
+    line = qn(CardProduct._meta.db_table)
+    product = qn(Product._meta.db_table)
+    card = qn(Card._meta.db_table)
+    sql = f"""
+        WITH expired AS (
+            SELECT "id" FROM {line}
+            WHERE "reserved_at" < %s
+            ORDER BY "reserved_at"
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        ), released AS (
+            DELETE FROM {line} AS l USING expired
+            WHERE l."id" = expired."id"
+            RETURNING l."card_id", l."product_id", l."quantity"
+        ), restocked AS (
+            UPDATE {product} AS p
+            SET "stock" = p."stock" + totals."quantity", "updated_at" = NOW()
+            FROM (
+                SELECT "product_id", SUM("quantity") AS "quantity"
+                FROM released GROUP BY "product_id"
+            ) AS totals
+            WHERE p."id" = totals."product_id"
+        )
+        SELECT c."user_id", released."product_id", released."quantity"
+        FROM released JOIN {card} AS c ON c."id" = released."card_id"
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [cutoff, batch_size])
+        return cursor.fetchall()
+
+
+def _release_batch_orm(cutoff, batch_size):
+    rows = list(
+        CardProduct.objects.select_for_update(skip_locked=True)
+        .filter(reserved_at__lt=cutoff)
+        .order_by("reserved_at")
+        .values_list("id", "card__user_id", "product_id", "quantity")[:batch_size]
+    )
+    if not rows:
+        return []
+
+    totals = defaultdict(int)
+    for _, _, product_id, quantity in rows:
+        totals[product_id] += quantity
+    CardProduct.objects.filter(id__in=[row[0] for row in rows]).delete()
+    Product.objects.filter(id__in=totals).update(
+        stock=F("stock")
+        + Case(*(When(id=pid, then=quantity) for pid, quantity in totals.items())),
+        updated_at=Now(),
+    )
+    return [row[1:] for row in rows]
+
+
+def release_expired_reservations(
+    ttl=None, batch_size=None, max_batches=None, now=None
+):
+    """
+    Delete cart lines reserved more than ``ttl`` seconds ago and return their
+    stock, ``batch_size`` lines per transaction. Returns the number of lines
+    released.
+    """
+    ttl = settings.CART_RESERVATION_TTL if ttl is None else ttl
+    batch_size = batch_size or settings.CART_RELEASE_BATCH_SIZE
+    cutoff = (now or timezone.now()) - timedelta(seconds=ttl)
+    release_batch = (
+        _release_batch_postgres
+        if connection.vendor == "postgresql"
+        else _release_batch_orm
+    )
+
+    released = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            rows = release_batch(cutoff, batch_size)
+        batches += 1
+        released += len(rows)
+        forget_cached_lines(rows)
+        if len(rows) < batch_size:
+            break
+    return released
+
+
+def forget_cached_lines(rows):
+    """Take released lines out of carts that are kept in the cache."""
+    if settings.CART_BACKEND != "cache" or not rows:
+        return
+    for user_id in {user_id for user_id, _, _ in rows}:
+        try:
+            CacheCart.for_user_id(user_id).forget()
+        except CartBusy:
+            logger.info("Cart of user %s busy, its next flush drops the lines", user_id)
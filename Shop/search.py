@@ -0,0 +1,176 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+SEARCH_CONFIG = "simple"
+NAME_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+class PostgresSearchBackend:
+    """Ranked search over the stored ``Product.search_vector`` tsvector column."""
+
+    def vector(self):
+        return SearchVector("name", weight="A", config=SEARCH_CONFIG) + SearchVector(
+            "description", weight="B", config=SEARCH_CONFIG
+        )
+
+    def index(self, product):
+        from Shop.models import Product
+
+        Product.objects.filter(pk=product.pk).update(search_vector=self.vector())
+
+    def index_many(self, ids):
+        from Shop.models import Product
+
+        Product.objects.filter(pk__in=ids).update(search_vector=self.vector())
+
+    def rebuild(self):
+        from Shop.models import Product
+
+        return Product.objects.update(search_vector=self.vector())
+
+    def search(self, queryset, text):
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+        # ts_rank returns float4; as float8 the keyset cursor round-trips exactly.
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+        )
+
+
+class InvertedIndexBackend:
+    """
+    In-process inverted index used when the database is not Postgres.
+
+    Postings are built lazily from the products table and patched on every
+    product save, so SQLite test runs get the same ranked behaviour offline.
+    The index is per process; it is not meant for multi-worker deployments.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._terms = {}
+
+    def _build(self):
+        from Shop.models import Product
+
+        self._postings = defaultdict(dict)
+        self._terms = {}
+        rows = Product.objects.values_list("id", "name", "description").iterator()
+        for pk, name, description in rows:
+            self._add(pk, name, description)
+
+    def _ensure_built(self):
+        if self._postings is None:
+            self._build()
+
+    def _add(self, pk, name, description):
+        weights = defaultdict(float)
+        for token in tokenize(name):
+            weights[token] += NAME_WEIGHT
+        for token in tokenize(description):
+            weights[token] += DESCRIPTION_WEIGHT
+        for token, weight in weights.items():
+            self._postings[token][pk] = weight
+        self._terms[pk] = set(weights)
+
+    def _remove(self, pk):
+        for token in self._terms.pop(pk, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(pk, None)
+                if not postings:
+                    del self._postings[token]
+
+    def index(self, product):
+        with self._lock:
+            if self._postings is None:
+                return
+            self._remove(product.pk)
+            self._add(product.pk, product.name, product.description)
+
+    def index_many(self, ids):
+        from Shop.models import Product
+
+        with self._lock:
+            if self._postings is None:
+                return
+            rows = Product.objects.filter(pk__in=ids).values_list(
+                "id", "name", "description"
+            )
+            for pk, name, description in rows:
+                self._remove(pk)
+                self._add(pk, name, description)
+
+    def rebuild(self):
+        with self._lock:
+            self._build()
+            return len(self._terms)
+
+    def rank(self, text):
+        tokens = set(tokenize(text))
+        if not tokens:
+            return {}
+
+        with self._lock:
+            self._ensure_built()
+            total = len(self._terms) or 1
+            scores = None
+            for token in tokens:
+                postings = self._postings.get(token, {})
+                idf = math.log(1 + total / (len(postings) or 1))
+                token_scores = {pk: w * idf for pk, w in postings.items()}
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        pk: score + token_scores[pk]
+                        for pk, score in scores.items()
+                        if pk in token_scores
+                    }
+        return scores or {}
+
+    def search(self, queryset, text):
+        scores = self.rank(text)
+        if not scores:
+            return queryset.none()
+        return queryset.filter(pk__in=scores).annotate(
+            rank=Case(
+                *[When(pk=pk, then=Value(score)) for pk, score in scores.items()],
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        )
+
+
+_backends = {}
+
+
+def get_search_backend():
+    vendor = connection.vendor
+    if vendor not in _backends:
+        if vendor == "postgresql":
+            _backends[vendor] = PostgresSearchBackend()
+        else:
+            _backends[vendor] = InvertedIndexBackend()
+    return _backends[vendor]
+
+
+def search_products(queryset, text):
+    queryset = get_search_backend().search(queryset, text)
+    if not queryset.query.order_by:
+        queryset = queryset.order_by("-rank", "id")
+    return queryset
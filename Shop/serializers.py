@@ -1,19 +1,22 @@
-import math
 import random
 from datetime import timedelta
 
-import stripe
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import FieldDoesNotExist
 from django.core.mail import send_mail
 from django.db import transaction
 from rest_framework import serializers, validators
 from rest_framework.serializers import (
     CharField,
     ChoiceField,
+    DateField,
+    DateTimeField,
+    DictField,
     EmailField,
     FloatField,
     IntegerField,
+    ListField,
     ModelSerializer,
     Serializer,
     SerializerMethodField,
@@ -24,16 +27,22 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.hashers import make_password, check_password
 
 from root import settings
+from Shop.carts import CartBusy, get_cart
+from Shop.filters import OrderFilter
+from Shop.images import variant_urls
 from Shop.models import (
     Card,
+    CardProduct,
     Category,
     Order,
     OrderedProduct,
+    PaymentOutbox,
     Product,
     Profile,
-    Transaction,
     FlashSales, Stars,
 )
+from Shop.payments import PaymentGatewayError, create_payment_intent
+from Shop.signals import order_status_changed
 
 from .models import ContactMessage
 from django.utils import timezone
@@ -41,6 +50,88 @@ from django.utils import timezone
 User = get_user_model()
 
 
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets: ``?fields=a,b`` keeps only those fields and ``?omit=c``
+    drops fields. ``sparse_queryset`` narrows the queryset with ``.only()`` to
+    the columns the remaining fields read. Method fields have to be listed in
+    ``sparse_sources`` (field name -> model fields it reads), otherwise the
+    queryset is left alone. Only reads are pruned, so writes still validate
+    and save every field.
+    """
+
+    fields_query_param = "fields"
+    omit_query_param = "omit"
+    sparse_methods = ("GET", "HEAD")
+    sparse_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        view = self.context.get("view")
+        if request is None or request.method not in self.sparse_methods:
+            return
+        if view is not None and not isinstance(self, view.get_serializer_class()):
+            return
+
+        requested = self._param_set(request, self.fields_query_param)
+        omitted = self._param_set(request, self.omit_query_param)
+        for name in list(self.fields):
+            if (requested and name not in requested) or name in omitted:
+                self.fields.pop(name)
+
+    @staticmethod
+    def _param_set(request, param):
+        value = request.query_params.get(param, "")
+        return {name.strip() for name in value.split(",") if name.strip()}
+
+    def model_sources(self):
+        """Model fields needed to render the current fields, or None if unknown."""
+        opts = self.Meta.model._meta
+        sources = set()
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if name in self.sparse_sources:
+                sources.update(self.sparse_sources[name])
+                continue
+            source = field.source.split(".")[0]
+            try:
+                model_field = opts.get_field(source)
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete:
+                return None
+            sources.add(source)
+        return sources
+
+    @classmethod
+    def sparse_queryset(cls, queryset, request):
+        if request.method not in cls.sparse_methods:
+            return queryset
+        if not (
+            request.query_params.get(cls.fields_query_param)
+            or request.query_params.get(cls.omit_query_param)
+        ):
+            return queryset
+
+        sources = cls(context={"request": request}).model_sources()
+        if sources is None:
+            return queryset
+
+        ordering = {
+            f.lstrip("-") for f in queryset.query.order_by if isinstance(f, str)
+        }
+        opts = queryset.model._meta
+        for name in ordering:
+            try:
+                if opts.get_field(name).concrete:
+                    sources.add(name)
+            except FieldDoesNotExist:
+                continue
+        return queryset.only(*sources)
+
+
 class CategorySerializer(ModelSerializer):
     class Meta:
         model = Category
@@ -48,16 +139,29 @@ class CategorySerializer(ModelSerializer):
         read_only_fields = ("id",)
 
 
-class ProductSerializer(ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, ModelSerializer):
     category = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
         required=True,
     )
+    # GeneratedField maps to a plain ModelField, which would render a float.
+    effective_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
+    image_srcset = SerializerMethodField()
+
+    sparse_sources = {"image_srcset": ["image_variants"]}
 
     class Meta:
         model = Product
-        fields = "__all__"
-        read_only_fields = ("id",)
+        exclude = ("search_vector", "content_hash", "image_variants")
+        read_only_fields = (
+            "id",
+            "effective_price",
+            "rating_sum",
+            "rating_count",
+            "rating_avg",
+        )
 
     def create(self, validated_data):
         category = validated_data.pop("category")
@@ -68,13 +172,31 @@ class ProductSerializer(ModelSerializer):
 
         return product
 
+    def get_image_srcset(self, obj):
+        return variant_urls(obj.image_variants, self.context.get("request"))
+
+
+class ProductImportRowSerializer(Serializer):
+    sku = CharField(max_length=64)
+    name = CharField(max_length=100)
+    description = CharField(min_length=10, max_length=4000)
+    price = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    stock = IntegerField(min_value=0, default=0)
+    discount_percent = IntegerField(min_value=0, max_value=100, default=0)
+    category = CharField(max_length=100, required=False, allow_blank=True)
+
 
 class ProfileSerializer(ModelSerializer):
+    img_srcset = SerializerMethodField()
+
     class Meta:
         model = Profile
-        exclude = ("user", "reset_code")
+        exclude = ("user", "reset_code", "img_variants")
         read_only_fields = ("id",)
 
+    def get_img_srcset(self, obj):
+        return variant_urls(obj.img_variants, self.context.get("request"))
+
 
 class RegisterSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -120,9 +242,11 @@ class RegisterSerializer(serializers.Serializer):
             return user
 
 
-class UserSerializer(ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, ModelSerializer):
     profile = ProfileSerializer(required=False)
 
+    sparse_sources = {"profile": []}
+
     class Meta:
         model = User
         exclude = (
@@ -146,7 +270,7 @@ class UserSerializer(ModelSerializer):
     def to_representation(self, instance):
         data = super().to_representation(instance)
         request = self.context.get("request", False)
-        if not request:
+        if not request or "profile" not in data:
             return data
 
         profile = instance.profile if hasattr(instance, "profile") else None
@@ -237,6 +361,7 @@ class CardSerializer(Serializer):
 
     def to_representation(self, instance):
         user = instance.user
+        totals = instance.totals()
         return {
             "user": user.email,
             "products": [
@@ -247,12 +372,22 @@ class CardSerializer(Serializer):
                 }
                 for product in instance.card_products.all()
             ],
+            "total_price": totals["total_amount"],
+            "item_count": totals["item_count"],
         }
 
 
+CART_BUSY_MESSAGE = "Muammo yuz berdi iltimos keyinroq urinib koring"
+
+
+PAYMENT_PENDING_MESSAGE = (
+    "To'lov tizimi javob bermadi, buyurtma saqlandi. To'lov holatini keyinroq tekshiring"
+)
+
+
 class ToCardSerializer(Serializer):
     product_id = UUIDField()
-    quantity = IntegerField()
+    quantity = IntegerField(min_value=1)
 
     def save(self, **kwargs):
         try:
@@ -260,27 +395,20 @@ class ToCardSerializer(Serializer):
         except KeyError:
             raise ValidationError({"message": "User not Found"})
 
+        cart = get_cart(user)
         try:
-            product = Product.objects.get(id=self.validated_data["product_id"])
+            added = cart.add(
+                self.validated_data["product_id"], self.validated_data["quantity"]
+            )
         except Product.DoesNotExist:
             raise ValidationError({"message": "Product topilmadi"})
-        else:
-            if product.stock < self.validated_data["quantity"]:
-                raise ValidationError({"message": "Product bazada kam"})
-
-        with transaction.atomic():
-            card, created = Card.objects.get_or_create(user=user)
-
-            added = card.to_card(
-                product=product, quantity=self.validated_data["quantity"]
-            )
+        except CartBusy:
+            raise ValidationError({"message": CART_BUSY_MESSAGE})
 
         if not added:
-            raise ValidationError(
-                {"message": "Muammo yuz berdi iltimos keyinroq urinib koring"}
-            )
+            raise ValidationError({"message": "Product bazada kam"})
 
-        return card
+        return cart
 
 
 class RemoveCardSerializer(Serializer):
@@ -290,24 +418,56 @@ class RemoveCardSerializer(Serializer):
     def save(self, **kwargs):
         user = self.context["user"]
 
+        cart = get_cart(user)
         try:
-            card = Card.objects.get(user=user)
+            removed = cart.remove(
+                self.validated_data["product_id"], self.validated_data.get("quantity")
+            )
         except Card.DoesNotExist:
             raise ValidationError({"message": "Card not Found"})
-
-        try:
-            product = Product.objects.get(id=self.validated_data["product_id"])
         except Product.DoesNotExist:
             raise ValidationError({"message": "Product topilmadi"})
-
-        removed = card.remove_card(
-            product=product, quantity=self.validated_data.get("quantity")
-        )
+        except CartBusy:
+            raise ValidationError({"message": CART_BUSY_MESSAGE})
 
         if not removed:
             raise ValidationError({"message": "Savatda product topilmadi"})
 
-        return card
+        return cart
+
+
+class CardOperationSerializer(Serializer):
+    ACTIONS = ("add", "remove", "set")
+
+    action = ChoiceField(choices=ACTIONS)
+    product_id = UUIDField()
+    quantity = IntegerField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        quantity = attrs.get("quantity")
+        if attrs["action"] in ("add", "set") and quantity is None:
+            raise ValidationError({"quantity": "This field is required."})
+        if attrs["action"] != "set" and quantity == 0:
+            raise ValidationError(
+                {"quantity": "Ensure this value is greater than or equal to 1."}
+            )
+        return attrs
+
+
+class CardBatchSerializer(Serializer):
+    MAX_OPERATIONS = 100
+
+    operations = CardOperationSerializer(
+        many=True, allow_empty=False, max_length=MAX_OPERATIONS
+    )
+
+    def save(self, **kwargs):
+        try:
+            return get_cart(self.context["user"]).apply(
+                self.validated_data["operations"]
+            )
+        except CartBusy:
+            raise ValidationError({"message": CART_BUSY_MESSAGE})
 
 
 class ToOrderSerializer(Serializer):
@@ -325,64 +485,89 @@ class ToOrderSerializer(Serializer):
         return value
 
     def save(self, **kwargs):
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-
         user = self.context["user"]
 
         try:
-            card = Card.objects.prefetch_related("card_products__product").get(
-                user=user
-            )
+            with get_cart(user).checkout():
+                outbox = self.place_order(user)
+        except CartBusy:
+            raise ValidationError({"message": CART_BUSY_MESSAGE})
+        if outbox is None:
+            return None
+        order = outbox.order
+
+        # The order is committed either way; without an intent the retry task
+        # creates it later and the client polls the order payment endpoint.
+        try:
+            intent = create_payment_intent(outbox.id)
+        except PaymentGatewayError:
+            return order, None
+        return order, intent.client_secret
+
+    def place_order(self, user):
+        """Move the cart lines to a new order; returns its outbox row or None."""
+        try:
+            card = Card.objects.get(user=user)
         except Card.DoesNotExist:
             raise ValidationError({"message": "Card not Found"})
 
+        # Only local writes happen in the transaction; the gateway is called
+        # after commit from the outbox row.
         with transaction.atomic():
+            # The lines move from the cart to the order, which holds their
+            # stock from here on; expiring cart reservations no longer see them.
+            lines = list(
+                CardProduct.objects.select_for_update()
+                .filter(card=card)
+                .values_list("id", "product_id", "quantity")
+            )
+            if not lines:
+                return None
+
             order = Order.objects.create(
                 user=user,
                 latitude=self.validated_data["latitude"],
                 longitude=self.validated_data["longitude"],
             )
+            OrderedProduct.objects.bulk_create(
+                OrderedProduct(order=order, product_id=product_id, quantity=quantity)
+                for _, product_id, quantity in lines
+            )
+            CardProduct.objects.filter(id__in=[pk for pk, _, _ in lines]).delete()
+            Order.objects.filter(pk=order.pk).snapshot_prices()
+            order.refresh_from_db(fields=["total_amount", "item_count"])
+            outbox = PaymentOutbox.objects.create(
+                order=order, amount=order.total_amount, currency="usd"
+            )
+        return outbox
 
-            order_products = [
-                OrderedProduct(
-                    order=order,
-                    product=cp.product,
-                    quantity=cp.quantity,
-                )
-                for cp in card.card_products.all()
-            ]
-            OrderedProduct.objects.bulk_create(order_products)
-
-            if order_products:
-                intent = stripe.PaymentIntent.create(
-                    amount=math.ceil(order.total_price * 100),
-                    currency="usd",
-                    payment_method_types=["card"],
-                    capture_method="automatic",
-                    metadata={"order_id": order.id},
-                )
 
-                Transaction.objects.create(
-                    user=user,
-                    order=order,
-                    stripe_payment_intent=intent.id,
-                    amount=order.total_price,
-                    currency="usd",
-                    status=intent.status,
-                )
+class OrderPaymentSerializer(ModelSerializer):
+    clientSecret = SerializerMethodField()
 
-                order.stripe_payment_intent = intent.id
-                order.save()
+    class Meta:
+        model = PaymentOutbox
+        fields = ("order", "status", "attempts", "clientSecret")
 
-                return intent.client_secret
+    def get_clientSecret(self, obj):
+        return obj.client_secret or None
 
 
-class OrderSerializer(ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, ModelSerializer):
     user = SerializerMethodField()
     status_display = CharField(source="get_status_display", read_only=True)
     total_price = SerializerMethodField()
+    item_count = SerializerMethodField()
     products = SerializerMethodField()
 
+    sparse_sources = {
+        "user": ["user"],
+        "status_display": ["status"],
+        "total_price": ["total_amount"],
+        "item_count": ["total_amount", "item_count"],
+        "products": [],
+    }
+
     class Meta:
         model = Order
         fields = "__all__"
@@ -393,12 +578,17 @@ class OrderSerializer(ModelSerializer):
     def get_total_price(self, obj):
         return obj.total_price
 
+    def get_item_count(self, obj):
+        return obj.totals()["item_count"]
+
     def get_products(self, obj):
         return [
             {
                 "product": item.product.name,
                 "quantity": item.quantity,
-                "price": item.product.price,
+                "price": (
+                    item.unit_price if item.unit_price is not None else item.product.price
+                ),
                 "total_price": item.total_price,
             }
             for item in obj.products.all()
@@ -415,30 +605,121 @@ class OrderSerializer(ModelSerializer):
         return value
 
 
+class ExportRangeSerializer(Serializer):
+    created_after = DateTimeField(required=False)
+    created_before = DateTimeField(required=False)
+
+    def validate(self, attrs):
+        after, before = attrs.get("created_after"), attrs.get("created_before")
+        if after and before and after >= before:
+            raise ValidationError("created_after created_before dan oldin bo'lishi kerak")
+        return attrs
+
+
+BULK_STATUS_MAX = 1000
+
+
+def send_status_changed(status, changes):
+    transaction.on_commit(
+        lambda: order_status_changed.send(sender=Order, status=status, changes=changes)
+    )
+
+
+class AnalyticsRangeSerializer(Serializer):
+    date_from = DateField(required=False)
+    date_to = DateField(required=False)
+    by = ChoiceField(choices=["revenue", "units", "orders"], default="revenue")
+    limit = IntegerField(min_value=1, max_value=100, default=10)
+
+    DEFAULT_DAYS = 30
+
+    def validate(self, attrs):
+        attrs.setdefault("date_to", timezone.localdate())
+        attrs.setdefault(
+            "date_from", attrs["date_to"] - timedelta(days=self.DEFAULT_DAYS - 1)
+        )
+        if attrs["date_from"] > attrs["date_to"]:
+            raise ValidationError("date_from date_to dan keyin bo'lmasligi kerak")
+        return attrs
+
+
 class ChangeOrderStatusSerializer(Serializer):
     order_id = UUIDField()
     status = ChoiceField(choices=[c[0] for c in Order.STATUS_CHOICES])
 
     def save(self, **kwargs):
-        try:
-            order = Order.objects.get(id=self.validated_data["order_id"])
-        except Order.DoesNotExist:
-            raise ValidationError({"message": "Order not Found"})
-
-        if self.validated_data["status"] not in [
-            "pending",
-            "paid",
-            "shipped",
-            "delivered",
-            "canceled",
-        ]:
-            raise ValidationError({"message": "Status xato"})
-
-        order.status = self.validated_data["status"]
-        order.save()
+        status = self.validated_data["status"]
+        with transaction.atomic():
+            orders = Order.objects.filter(id=self.validated_data["order_id"])
+            order = orders.select_for_update().first()
+            if order is None:
+                raise ValidationError({"message": "Order not Found"})
+            # Re-sending the current status is a no-op, not a transition.
+            if order.status == status:
+                return order
+            changes, rejected = orders.set_status(status)
+            if rejected:
+                raise ValidationError(
+                    {"message": f"{order.status} -> {status} o'tish mumkin emas"}
+                )
+            send_status_changed(status, changes)
+
+        order.refresh_from_db()
         return order
 
 
+class BulkOrderStatusSerializer(Serializer):
+    order_ids = ListField(
+        child=UUIDField(), required=False, allow_empty=False, max_length=BULK_STATUS_MAX
+    )
+    filter = DictField(required=False)
+    status = ChoiceField(choices=[c[0] for c in Order.STATUS_CHOICES])
+
+    def validate(self, attrs):
+        if ("order_ids" in attrs) == ("filter" in attrs):
+            raise ValidationError({"message": "order_ids yoki filter kiriting"})
+        if "filter" in attrs:
+            # django-filter ignores keys it does not know, so a typo or an
+            # empty filter would otherwise select every order.
+            unknown = set(attrs["filter"]) - set(OrderFilter.base_filters)
+            if unknown:
+                raise ValidationError(
+                    {"filter": f"Noma'lum filter: {', '.join(sorted(unknown))}"}
+                )
+            if all(value in (None, "") for value in attrs["filter"].values()):
+                raise ValidationError({"filter": "Kamida bitta filter kiriting"})
+            filterset = OrderFilter(data=attrs["filter"], queryset=Order.objects.all())
+            if not filterset.is_valid():
+                raise ValidationError({"filter": filterset.errors})
+            ids = list(
+                filterset.qs.order_by().values_list("id", flat=True)[
+                    : BULK_STATUS_MAX + 1
+                ]
+            )
+            if len(ids) > BULK_STATUS_MAX:
+                raise ValidationError(
+                    {"filter": f"{BULK_STATUS_MAX} tadan ko'p buyurtma tanlandi"}
+                )
+            attrs["order_ids"] = ids
+        return attrs
+
+    def save(self, **kwargs):
+        ids = self.validated_data["order_ids"]
+        status = self.validated_data["status"]
+        with transaction.atomic():
+            changes, rejected = Order.objects.filter(id__in=ids).set_status(status)
+            if changes:
+                send_status_changed(status, changes)
+
+        changed = [pk for group in changes.values() for pk in group]
+        seen = set(changed) | set(rejected)
+        return {
+            "changed": changed,
+            "rejected": rejected,
+            "not_found": [pk for pk in dict.fromkeys(ids) if pk not in seen],
+        }
+
+
 class ResetPasswordByOldPasswordSerializer(Serializer):
     old_password = CharField(write_only=True)
     new_password = CharField(write_only=True)
@@ -502,8 +783,14 @@ class ContactMessageSerializer(serializers.ModelSerializer):
 class ProductInFlashSerializer(ProductSerializer):
     class Meta:
         model = Product
-        read_only_fields = ("id",)
-        exclude = ("flash",)
+        read_only_fields = (
+            "id",
+            "effective_price",
+            "rating_sum",
+            "rating_count",
+            "rating_avg",
+        )
+        exclude = ("flash", "search_vector", "content_hash", "image_variants")
 
 class FlashSalesSerializer(ModelSerializer):
     products = ProductInFlashSerializer(many=True, required=False)
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+from Shop.cache import bump_catalog_version
+from Shop.models import Category, FlashSales, Product, Stars
+
+# Sent once per status change request, after commit, with
+# ``status`` (the new status) and ``changes`` ({old_status: [order ids]}).
+order_status_changed = Signal()
+
+
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+for model in (Product, Category, FlashSales, Stars):
+    post_save.connect(catalog_changed, sender=model)
+    post_delete.connect(catalog_changed, sender=model)
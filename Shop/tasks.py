@@ -1,7 +1,17 @@
 from os import getenv
 
 from celery import shared_task
+from django.apps import apps
 from django.core.mail import send_mail
+from django.db.models import Q
+from django.utils import timezone
+
+from Shop import reservations
+from Shop.cache import bump_catalog_version
+from Shop.carts import CacheCart
+from Shop.images import build_variants, delete_variants, variant_paths
+from Shop.payments import retry_pending_intents
+from Shop.recommendations import build_related_products
 
 
 @shared_task
@@ -22,3 +32,55 @@ def send_contact_email(name, email, phone, message):
         [admin for admin in admins.split(",")],
         fail_silently=False,
     )
+
+
+@shared_task
+def generate_image_variants(model_label, pk):
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return None
+
+    field = instance.image_field
+    fieldfile = getattr(instance, field)
+    old_variants = getattr(instance, instance.variants_field)
+    variants = build_variants(fieldfile) if fieldfile else {}
+
+    # Skip the write if the image was replaced while we were resizing.
+    if fieldfile:
+        same_image = Q(**{field: fieldfile.name})
+    else:
+        same_image = Q(**{field: ""}) | Q(**{f"{field}__isnull": True})
+    changes = {instance.variants_field: variants}
+    if hasattr(model, "updated_at"):
+        changes["updated_at"] = timezone.now()
+    updated = model.objects.filter(same_image, pk=pk).update(**changes)
+
+    if not updated:
+        delete_variants(variants)
+        return None
+
+    delete_variants(old_variants, keep=variant_paths(variants))
+    if model_label == "Shop.Product":
+        bump_catalog_version()
+    return variants
+
+
+@shared_task
+def rebuild_related_products(top_k=None):
+    return build_related_products(top_k=top_k)
+
+
+@shared_task
+def persist_cart(user_id):
+    return CacheCart.for_user_id(user_id).persist()
+
+
+@shared_task
+def release_expired_reservations(max_batches=None):
+    return reservations.release_expired_reservations(max_batches=max_batches)
+
+
+@shared_task
+def retry_payment_intents(limit=100):
+    return retry_pending_intents(limit=limit)
@@ -0,0 +1,87 @@
+import re
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+
+from Shop import models
+
+
+@pytest.fixture
+def assert_index_scan(db):
+    """
+    EXPLAIN a queryset with sequential scans disabled and fail unless every
+    given index appears in the plan and its table is not read by a Seq Scan.
+    With seqscans off the planner falls back to any index, so naming the
+    expected one is what proves it can serve the query.
+    """
+    if connection.vendor != "postgresql":
+        pytest.skip("EXPLAIN checks need Postgres")
+
+    def check(queryset, *indexes):
+        assert indexes, "name the index the query should use"
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+        try:
+            plan = queryset.explain()
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("RESET enable_seqscan")
+        assert not re.search(rf'Seq Scan on "?{table}"?\b', plan), plan
+        for index in indexes:
+            assert re.search(rf'\b{index}\b', plan), plan
+        return plan
+
+    return check
+
+
+@pytest.fixture
+def seeded_shop(db, django_user_model):
+    categories = models.Category.objects.bulk_create(
+        models.Category(name=f"category {i}") for i in range(5)
+    )
+    users = django_user_model.objects.bulk_create(
+        django_user_model(username=f"seed{i}", email=f"seed{i}@test.com")
+        for i in range(50)
+    )
+    products = models.Product.objects.bulk_create(
+        models.Product(
+            category=categories[i % len(categories)],
+            name=f"product {i}",
+            description="seeded product",
+            price=Decimal(10 + i),
+            discount_percent=i % 30,
+        )
+        for i in range(300)
+    )
+    orders = models.Order.objects.bulk_create(
+        models.Order(
+            user=users[i % len(users)],
+            latitude=41.3,
+            longitude=69.2,
+            paid=i % 2 == 0,
+            stripe_payment_intent=f"pi_{i}" if i % 3 else None,
+        )
+        for i in range(2000)
+    )
+    models.Transaction.objects.bulk_create(
+        models.Transaction(
+            user=order.user,
+            order=order,
+            stripe_payment_intent=order.stripe_payment_intent,
+            amount=Decimal("10.00"),
+            status="requires_payment_method",
+        )
+        for order in orders
+        if order.stripe_payment_intent
+    )
+    models.Stars.objects.bulk_create(
+        models.Stars(user=user, product=product, grade=1 + i % 5)
+        for i, (user, product) in enumerate(
+            (user, product) for user in users for product in products[:50]
+        )
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    return {"categories": categories, "users": users, "products": products}
@@ -0,0 +1,198 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Shop import models
+from Shop.analytics import record_paid_order
+
+
+@pytest.fixture
+def staff(db, django_user_model):
+    return django_user_model.objects.create_user(
+        username="admin", email="admin@test.com", password="1234", is_staff=True
+    )
+
+
+@pytest.fixture
+def catalog(db):
+    lamps = models.Category.objects.create(name="Lamps")
+    return {
+        "lamp": models.Product.objects.create(
+            name="Lamp", price=Decimal("20"), stock=100, category=lamps
+        ),
+        "bulb": models.Product.objects.create(
+            name="Bulb", price=Decimal("2.50"), stock=100, category=lamps
+        ),
+        "misc": models.Product.objects.create(name="Misc", price=Decimal("1"), stock=100),
+    }
+
+
+def make_order(user, lines, intent=None):
+    order = models.Order.objects.create(
+        user=user, latitude=1, longitude=1, stripe_payment_intent=intent
+    )
+    models.OrderedProduct.objects.bulk_create(
+        models.OrderedProduct(order=order, product=product, quantity=quantity)
+        for product, quantity in lines
+    )
+    models.Order.objects.filter(pk=order.pk).snapshot_prices()
+    return order
+
+
+def pay(order, paid_at=None):
+    paid_at = paid_at or timezone.now()
+    models.Order.objects.filter(pk=order.pk).update(paid=True, paid_at=paid_at)
+    record_paid_order(order.pk, paid_at)
+
+
+def rollups():
+    return {
+        "daily": list(
+            models.SalesDaily.objects.order_by("day").values_list(
+                "day", "revenue", "units", "orders"
+            )
+        ),
+        "products": sorted(
+            models.ProductSalesDaily.objects.values_list(
+                "day", "product_name", "revenue", "units", "orders"
+            )
+        ),
+        "categories": sorted(
+            models.CategorySalesDaily.objects.values_list(
+                "day", "category_name", "revenue", "units", "orders"
+            ),
+            key=str,
+        ),
+    }
+
+
+@pytest.mark.django_db
+class TestRollups:
+    def test_paid_orders_add_up(self, staff, catalog):
+        today = timezone.localdate()
+        pay(make_order(staff, [(catalog["lamp"], 2), (catalog["misc"], 1)]))
+        pay(make_order(staff, [(catalog["lamp"], 1), (catalog["bulb"], 4)]))
+
+        data = rollups()
+        assert data["daily"] == [(today, Decimal("71.00"), 8, 2)]
+        assert data["products"] == [
+            (today, "Bulb", Decimal("10.00"), 4, 1),
+            (today, "Lamp", Decimal("60.00"), 3, 2),
+            (today, "Misc", Decimal("1.00"), 1, 1),
+        ]
+        assert data["categories"] == sorted(
+            [
+                (today, "Lamps", Decimal("70.00"), 7, 2),
+                (today, None, Decimal("1.00"), 1, 1),
+            ],
+            key=str,
+        )
+
+    def test_rebuild_matches_incremental(self, staff, catalog):
+        yesterday = timezone.now() - timedelta(days=1)
+        pay(make_order(staff, [(catalog["lamp"], 2), (catalog["misc"], 1)]), yesterday)
+        pay(make_order(staff, [(catalog["misc"], 3)]))
+        pay(make_order(staff, [(catalog["bulb"], 1), (catalog["misc"], 1)]))
+        make_order(staff, [(catalog["lamp"], 5)])  # unpaid
+        incremental = rollups()
+
+        models.SalesDaily.objects.update(revenue=0)
+        call_command("rebuild_sales_rollups", batch_size=1)
+        assert rollups() == incremental
+
+        call_command("rebuild_sales_rollups", since=timezone.localdate().isoformat())
+        assert rollups() == incremental
+
+
+@pytest.mark.django_db
+class TestWebhookRollup:
+    @patch("stripe.Webhook.construct_event")
+    def test_counted_once_on_redelivery(self, construct_event, staff, catalog):
+        order = make_order(staff, [(catalog["lamp"], 1)], intent="pi_1")
+        event = {"type": "payment_intent.succeeded", "data": {"object": {"id": "pi_1"}}}
+        construct_event.return_value = event
+        client = APIClient()
+        for _ in range(2):
+            resp = client.post(
+                reverse("stripe-webhook"),
+                data=json.dumps(event),
+                content_type="application/json",
+                HTTP_STRIPE_SIGNATURE="t",
+            )
+            assert resp.status_code == 200
+
+        order.refresh_from_db()
+        assert order.paid and order.paid_at is not None
+        assert list(models.SalesDaily.objects.values_list("revenue", "orders")) == [
+            (Decimal("20.00"), 1)
+        ]
+
+
+@pytest.mark.django_db
+class TestAnalyticsViews:
+    @pytest.fixture
+    def client(self, staff, catalog):
+        pay(make_order(staff, [(catalog["lamp"], 1), (catalog["bulb"], 10)]))
+        pay(make_order(staff, [(catalog["misc"], 2)]), timezone.now() - timedelta(days=40))
+        client = APIClient()
+        client.force_authenticate(staff)
+        return client
+
+    def test_sales_defaults_to_last_30_days(self, client, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            resp = client.get(reverse("analytics-sales"))
+        assert resp.status_code == 200
+        assert resp.data["date_to"] == timezone.localdate()
+        assert [row["revenue"] for row in resp.data["results"]] == [Decimal("45.00")]
+
+    def test_top_products(self, client):
+        resp = client.get(reverse("analytics-top-products"), {"by": "units", "limit": 1})
+        assert [row["product_name"] for row in resp.data["results"]] == ["Bulb"]
+        resp = client.get(reverse("analytics-top-products"))
+        assert [row["product_name"] for row in resp.data["results"]] == ["Bulb", "Lamp"]
+
+    def test_categories_with_range(self, client):
+        date_from = (timezone.localdate() - timedelta(days=60)).isoformat()
+        resp = client.get(reverse("analytics-categories"), {"date_from": date_from})
+        assert [(row["category_name"], row["units"]) for row in resp.data["results"]] == [
+            ("Lamps", 11),
+            (None, 2),
+        ]
+
+    def test_history_survives_deletes(self, client, catalog):
+        catalog["lamp"].name = "Desk lamp"
+        catalog["lamp"].save()
+        catalog["bulb"].delete()
+        models.Category.objects.get(name="Lamps").delete()
+
+        resp = client.get(reverse("analytics-top-products"))
+        assert [row["product_name"] for row in resp.data["results"]] == [
+            "Bulb",
+            "Desk lamp",
+        ]
+        date_from = (timezone.localdate() - timedelta(days=60)).isoformat()
+        resp = client.get(reverse("analytics-categories"), {"date_from": date_from})
+        assert [(row["category_name"], row["units"]) for row in resp.data["results"]] == [
+            ("Lamps", 11),
+            (None, 2),
+        ]
+
+    def test_bad_range(self, client):
+        resp = client.get(
+            reverse("analytics-sales"),
+            {"date_from": "2025-02-01", "date_to": "2025-01-01"},
+        )
+        assert resp.status_code == 400
+
+    def test_staff_only(self, django_user_model):
+        user = django_user_model.objects.create_user(username="c", email="c@t.com")
+        client = APIClient()
+        client.force_authenticate(user)
+        assert client.get(reverse("analytics-sales")).status_code == 403
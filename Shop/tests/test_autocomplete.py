@@ -0,0 +1,65 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Shop import autocomplete, models
+from Shop.autocomplete import PrefixIndex
+
+
+@pytest.fixture
+def products(db):
+    rows = [("Red Phone Case", 3), ("Phone charger", 10), ("Photo frame", 0), ("Lamp", 4)]
+    return [
+        models.Product.objects.create(name=name, price=10, rating_sum=stars)
+        for name, stars in rows
+    ]
+
+
+def test_prefix_index_matches_word_boundaries():
+    index = PrefixIndex([(1, "Phone charger"), (2, "Red Phone Case"), (3, "Photo frame")])
+
+    assert [row["id"] for row in index.search("pho")] == [1, 2, 3]
+    assert [row["id"] for row in index.search("PHONE ca")] == [2]
+    assert [row["id"] for row in index.search("pho", limit=1)] == [1]
+    assert [row["id"] for row in index.search("p")] == [1, 2, 3]
+    assert index.search("ase") == []
+    assert index.search("  ") == []
+
+
+@pytest.mark.django_db
+class TestAutocompleteView:
+    def test_ranked_by_rating_without_queries(
+        self, products, django_assert_num_queries
+    ):
+        client = APIClient()
+        url = reverse("product-autocomplete")
+        client.get(url, {"q": "x"})
+
+        with django_assert_num_queries(0):
+            resp = client.get(url, {"q": "pho", "limit": 2})
+        assert resp.status_code == 200
+        assert [row["name"] for row in resp.data] == ["Phone charger", "Red Phone Case"]
+
+    def test_refreshed_after_catalog_write(self, products):
+        client = APIClient()
+        url = reverse("product-autocomplete")
+        assert client.get(url, {"q": "lamp"}).data[0]["name"] == "Lamp"
+
+        models.Product.objects.create(name="Lampshade", price=5, rating_sum=9)
+        assert [row["name"] for row in client.get(url, {"q": "lamp"}).data] == [
+            "Lampshade",
+            "Lamp",
+        ]
+
+    def test_stale_index_served_during_rebuild(
+        self, products, django_assert_num_queries
+    ):
+        client = APIClient()
+        url = reverse("product-autocomplete")
+        client.get(url, {"q": "x"})
+        models.Product.objects.create(name="Lampshade", price=5, rating_sum=9)
+
+        # Another request holds the lock while it rebuilds.
+        with autocomplete._lock, django_assert_num_queries(0):
+            resp = client.get(url, {"q": "lamp"})
+        assert [row["name"] for row in resp.data] == ["Lamp"]
@@ -0,0 +1,168 @@
+import uuid
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Shop import models
+from Shop.signals import order_status_changed
+
+
+@pytest.fixture
+def staff(db, django_user_model):
+    return django_user_model.objects.create_user(
+        username="admin", email="admin@test.com", password="1234", is_staff=True
+    )
+
+
+@pytest.fixture
+def client(staff):
+    client = APIClient()
+    client.force_authenticate(staff)
+    return client
+
+
+def make_orders(user, count, **fields):
+    return [
+        models.Order.objects.create(user=user, latitude=1, longitude=1, **fields)
+        for _ in range(count)
+    ]
+
+
+@pytest.fixture
+def events():
+    received = []
+
+    def receiver(sender, **kwargs):
+        received.append(kwargs)
+
+    order_status_changed.connect(receiver)
+    yield received
+    order_status_changed.disconnect(receiver)
+
+
+def post(client, data):
+    return client.post(reverse("order-bulk-status"), data, format="json")
+
+
+@pytest.mark.django_db
+class TestBulkOrderStatus:
+    def test_transitions_by_id(
+        self, client, staff, events, django_capture_on_commit_callbacks
+    ):
+        pending = make_orders(staff, 3)
+        shipped = make_orders(staff, 2, status="shipped")
+        delivered = make_orders(staff, 1, status="delivered")
+        missing = uuid.uuid4()
+        ids = [str(o.id) for o in pending + shipped + delivered] + [str(missing)]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            with CaptureQueriesContext(connection) as ctx:
+                resp = post(client, {"order_ids": ids, "status": "canceled"})
+        assert resp.status_code == 200, resp.content
+
+        assert set(resp.data["changed"]) == {o.id for o in pending + shipped}
+        assert resp.data["rejected"] == [delivered[0].id]
+        assert resp.data["not_found"] == [missing]
+        assert set(
+            models.Order.objects.filter(status="canceled").values_list("id", flat=True)
+        ) == {o.id for o in pending + shipped}
+
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        assert len(updates) == 2
+
+        assert len(events) == 1
+        assert events[0]["status"] == "canceled"
+        assert set(events[0]["changes"]["pending"]) == {o.id for o in pending}
+        assert set(events[0]["changes"]["shipped"]) == {o.id for o in shipped}
+
+    def test_by_filter(self, client, staff):
+        pending = make_orders(staff, 2)
+        make_orders(staff, 2, status="shipped")
+        resp = post(client, {"filter": {"status": "pending"}, "status": "shipped"})
+        assert set(resp.data["changed"]) == {o.id for o in pending}
+        assert models.Order.objects.filter(status="shipped").count() == 4
+
+    def test_filter_too_broad(self, client, staff, monkeypatch):
+        monkeypatch.setattr("Shop.serializers.BULK_STATUS_MAX", 2)
+        make_orders(staff, 3)
+        resp = post(client, {"filter": {"paid": False}, "status": "shipped"})
+        assert resp.status_code == 400
+        assert not models.Order.objects.filter(status="shipped").exists()
+
+    def test_unknown_filter_key(self, client, staff):
+        make_orders(staff, 2, status="shipped")
+        resp = post(client, {"filter": {"stauts": "shipped"}, "status": "canceled"})
+        assert resp.status_code == 400
+        assert "stauts" in str(resp.data["filter"])
+        assert not models.Order.objects.filter(status="canceled").exists()
+
+    @pytest.mark.parametrize("order_filter", [{}, {"status": ""}, {"user": None}])
+    def test_empty_filter(self, client, staff, order_filter):
+        make_orders(staff, 2)
+        resp = post(client, {"filter": order_filter, "status": "canceled"})
+        assert resp.status_code == 400
+        assert not models.Order.objects.filter(status="canceled").exists()
+
+    def test_ids_or_filter_required(self, client, staff):
+        (order,) = make_orders(staff, 1)
+        assert post(client, {"status": "shipped"}).status_code == 400
+        resp = post(
+            client,
+            {"order_ids": [str(order.id)], "filter": {}, "status": "shipped"},
+        )
+        assert resp.status_code == 400
+
+    def test_nothing_changed_sends_no_event(
+        self, client, staff, events, django_capture_on_commit_callbacks
+    ):
+        (order,) = make_orders(staff, 1, status="delivered")
+        with django_capture_on_commit_callbacks(execute=True):
+            resp = post(client, {"order_ids": [str(order.id)], "status": "shipped"})
+        assert resp.data["rejected"] == [order.id]
+        assert events == []
+
+    def test_staff_only(self, django_user_model):
+        user = django_user_model.objects.create_user(username="c", email="c@t.com")
+        client = APIClient()
+        client.force_authenticate(user)
+        assert post(client, {"filter": {}, "status": "shipped"}).status_code == 403
+
+
+@pytest.mark.django_db
+class TestChangeOrderStatus:
+    def change(self, client, order, status):
+        return client.post(
+            reverse("change-order-status"),
+            {"order_id": str(order.id), "status": status},
+            format="json",
+        )
+
+    def test_allowed_transition(
+        self, client, staff, events, django_capture_on_commit_callbacks
+    ):
+        (order,) = make_orders(staff, 1)
+        with django_capture_on_commit_callbacks(execute=True):
+            resp = self.change(client, order, "shipped")
+        assert resp.status_code == 200, resp.content
+        order.refresh_from_db()
+        assert order.status == "shipped"
+        assert events[0]["changes"] == {"pending": [order.id]}
+
+    def test_final_status_is_kept(
+        self, client, staff, events, django_capture_on_commit_callbacks
+    ):
+        (order,) = make_orders(staff, 1, status="delivered")
+        with django_capture_on_commit_callbacks(execute=True):
+            resp = self.change(client, order, "pending")
+        assert resp.status_code == 400
+        order.refresh_from_db()
+        assert order.status == "delivered"
+        assert events == []
+
+    def test_same_status_is_a_no_op(self, client, staff, events):
+        (order,) = make_orders(staff, 1, status="shipped")
+        assert self.change(client, order, "shipped").status_code == 200
+        assert events == []
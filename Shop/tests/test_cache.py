@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from Shop import models
+from Shop.cache import LocalLRU, catalog_version, product_list_cache
+from Shop.views import FlashSaleAddProductsView
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def product(db):
+    return models.Product.objects.create(name="iPhone", price=1000)
+
+
+@pytest.mark.django_db
+class TestProductListCache:
+    def test_repeated_request_skips_db(self, api_client, product, django_assert_num_queries):
+        url = reverse("product-list")
+        first = api_client.get(url, {"sort": "price_up", "page_size": 5})
+
+        with django_assert_num_queries(0):
+            second = api_client.get(url, {"page_size": 5, "sort": "price_up"})
+        assert second.data == first.data
+
+    def test_catalog_write_invalidates(self, api_client, product):
+        url = reverse("product-list")
+        assert api_client.get(url).data["count"] == 1
+
+        version = catalog_version()
+        models.Product.objects.create(name="Pixel", price=900)
+        assert catalog_version() > version
+        assert api_client.get(url).data["count"] == 2
+
+    def test_flash_sale_assignment_invalidates(self, product):
+        flash = models.FlashSales.objects.create(
+            start_at=timezone.now(), end_at=timezone.now() + timedelta(days=1)
+        )
+        version = catalog_version()
+
+        request = APIRequestFactory().post(
+            "", {"products": [str(product.id)]}, format="json"
+        )
+        FlashSaleAddProductsView.as_view()(request, pk=flash.id)
+        assert catalog_version() > version
+
+    def test_local_tier_shields_backend(self, api_client, product):
+        url = reverse("product-list")
+        api_client.get(url)
+        key = product_list_cache.key(Request(APIRequestFactory().get(url)))
+        cache.delete(key)
+        assert product_list_cache.get(key) is not None
+
+
+class TestLocalLRU:
+    def test_evicts_least_recently_used_by_size(self):
+        lru = LocalLRU(max_bytes=200)
+        lru.set("a", "x" * 60, timeout=60)
+        lru.set("b", "y" * 60, timeout=60)
+        lru.get("a")
+        lru.set("c", "z" * 60, timeout=60)
+
+        assert lru.get("b") is None
+        assert lru.get("a") == "x" * 60
+        assert lru.get("c") == "z" * 60
+        assert lru.size <= 200
+
+    def test_skips_oversized_and_expired(self):
+        lru = LocalLRU(max_bytes=50)
+        lru.set("big", "x" * 100, timeout=60)
+        lru.set("old", "y", timeout=-1)
+
+        assert lru.get("big") is None
+        assert lru.get("old") is None
+        assert lru.size == 0
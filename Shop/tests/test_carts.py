@@ -0,0 +1,171 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Shop import models
+from Shop.carts import CacheCart, CartBusy, get_cart
+from Shop.reservations import release_expired_reservations
+from Shop.tasks import persist_cart
+
+
+@pytest.fixture(autouse=True)
+def cache_backend(settings):
+    settings.CART_BACKEND = "cache"
+    cache.clear()
+
+
+@pytest.fixture
+def user(db, django_user_model):
+    return django_user_model.objects.create_user(
+        username="buyer", email="buyer@test.com", password="1234"
+    )
+
+
+@pytest.fixture
+def product(db):
+    return models.Product.objects.create(name="Lamp", price=20, stock=5)
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.mark.django_db
+class TestCacheCart:
+    def test_add_writes_behind(
+        self, client, user, product, django_capture_on_commit_callbacks
+    ):
+        assert isinstance(get_cart(user), CacheCart)
+        with patch("Shop.tasks.persist_cart.apply_async") as apply_async:
+            with django_capture_on_commit_callbacks(execute=True):
+                client.post(reverse("to-card"), {"product_id": product.id, "quantity": 2})
+                client.post(reverse("to-card"), {"product_id": product.id, "quantity": 1})
+        apply_async.assert_called_once_with((user.pk,), countdown=11)
+
+        product.refresh_from_db()
+        assert product.stock == 2
+        assert not models.CardProduct.objects.exists()
+
+        assert persist_cart(user.pk)
+        assert models.CardProduct.objects.get(card__user=user).quantity == 3
+        assert not persist_cart(user.pk)
+
+    def test_stock_is_still_reserved_in_db(self, client, product):
+        resp = client.post(reverse("to-card"), {"product_id": product.id, "quantity": 6})
+        assert resp.status_code == 400
+        assert resp.data["message"] == "Product bazada kam"
+
+    def test_remove_releases_stock(self, client, user, product):
+        get_cart(user).add(product.id, 4)
+        resp = client.post(reverse("remove-card"), {"product_id": product.id, "quantity": 3})
+        assert resp.status_code == 200
+
+        product.refresh_from_db()
+        assert product.stock == 4
+        get_cart(user).persist()
+        assert models.CardProduct.objects.get(card__user=user).quantity == 1
+
+    def test_remove_then_expiry_releases_once(self, user, product):
+        cart = get_cart(user)
+        cart.add(product.id, 3)
+        cart.persist()
+        models.CardProduct.objects.update(reserved_at=timezone.now() - timedelta(hours=2))
+
+        assert cart.remove(product.id, 1)
+        assert models.CardProduct.objects.get(card__user=user).quantity == 2
+        assert release_expired_reservations(ttl=3600) == 1
+
+        product.refresh_from_db()
+        assert product.stock == 5
+        cart.persist()
+        assert not models.CardProduct.objects.exists()
+        assert not cart.remove(product.id)
+
+    def test_checkout_persists_synchronously(self, client, user, product):
+        get_cart(user).add(product.id, 2)
+        intent = type("PI", (), {"id": "pi_cart", "client_secret": "cs", "status": "ok"})()
+        with patch("stripe.PaymentIntent.create", return_value=intent):
+            resp = client.post(
+                reverse("to-order"), {"latitude": 41.3, "longitude": 69.2}, format="json"
+            )
+        assert resp.status_code == 200
+        order = models.Order.objects.get(stripe_payment_intent="pi_cart")
+        assert order.products.get().quantity == 2
+
+    def test_remove_after_checkout_keeps_ordered_stock(self, client, user, product):
+        cart = get_cart(user)
+        cart.add(product.id, 3)
+        cart.persist()
+        intent = type("PI", (), {"id": "pi_cart", "client_secret": "cs", "status": "ok"})()
+        with patch("stripe.PaymentIntent.create", return_value=intent):
+            client.post(
+                reverse("to-order"), {"latitude": 41.3, "longitude": 69.2}, format="json"
+            )
+        assert cache.get(cart.key) is None
+
+        resp = client.post(reverse("remove-card"), {"product_id": product.id})
+        assert resp.status_code == 400
+        product.refresh_from_db()
+        assert product.stock == 2
+
+    def test_batch_flushes_cached_lines_first(self, user, product):
+        cart = get_cart(user)
+        cart.add(product.id, 1)
+        results = cart.apply(
+            [{"action": "add", "product_id": product.id, "quantity": 2}]
+        )
+        assert results[0]["quantity"] == 3
+        assert cache.get(cart.key) is None
+        assert models.CardProduct.objects.get(card__user=user).quantity == 3
+
+    def test_card_detail_sees_pending_lines(self, client, user, product):
+        get_cart(user).add(product.id, 2)
+        card = models.Card.objects.create(user=user)
+        resp = client.get(reverse("card-detail", args=[card.pk]))
+        assert resp.data["item_count"] == 2
+
+    def test_flush_refreshes_only_grown_lines(self, user, product):
+        other = models.Product.objects.create(name="Bulb", price=2, stock=5)
+        cart = get_cart(user)
+        cart.add(product.id, 1)
+        cart.add(other.id, 2)
+        cart.persist()
+        old = timezone.now() - timedelta(hours=2)
+        models.CardProduct.objects.update(reserved_at=old)
+
+        cart.add(product.id, 1)
+        cart.remove(other.id, 1)
+        cart.persist()
+
+        lines = {line.product_id: line for line in models.CardProduct.objects.all()}
+        assert lines[product.id].quantity == 2
+        assert lines[product.id].reserved_at > old
+        assert (lines[other.id].quantity, lines[other.id].reserved_at) == (1, old)
+
+    def test_flush_drops_lines_released_while_busy(self, user, product):
+        cart = get_cart(user)
+        cart.add(product.id, 2)
+        cart.persist()
+        models.CardProduct.objects.update(reserved_at=timezone.now() - timedelta(hours=2))
+        with patch.object(CacheCart, "forget", side_effect=CartBusy):
+            assert release_expired_reservations(ttl=3600) == 1
+
+        cart.add(product.id, 1)
+        cart.persist()
+
+        assert models.CardProduct.objects.get(card__user=user).quantity == 1
+        product.refresh_from_db()
+        assert product.stock == 4
+        # A late forget for the same release changes nothing.
+        cart.add(product.id, 1)
+        cart.forget()
+        cart.persist()
+        assert models.CardProduct.objects.get(card__user=user).quantity == 2
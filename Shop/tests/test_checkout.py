@@ -0,0 +1,182 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Shop import models, payments
+from Shop.payments import FakeGateway, PaymentGatewayError, PaymentIntent
+from Shop.reservations import release_expired_reservations
+
+
+@pytest.fixture(autouse=True)
+def fake_gateway(settings):
+    settings.PAYMENT_GATEWAY = "fake"
+    settings.PAYMENT_RETRY_DELAY = 0
+    payments._gateways.clear()
+    yield
+    payments._gateways.clear()
+
+
+@pytest.fixture
+def user(db, django_user_model):
+    return django_user_model.objects.create_user(
+        username="buyer", email="buyer@test.com", password="1234"
+    )
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def cart(user):
+    product = models.Product.objects.create(name="Lamp", price=20, stock=5)
+    card = models.Card.objects.create(user=user)
+    card.card_products.create(product=product, quantity=2)
+    return card
+
+
+def checkout(client):
+    return client.post(
+        reverse("to-order"), {"latitude": 41.31, "longitude": 69.28}, format="json"
+    )
+
+
+@pytest.mark.django_db
+class TestCheckout:
+    def test_fake_gateway_intent_is_recorded(self, client, user, cart):
+        resp = checkout(client)
+        assert resp.status_code == 200, resp.content
+
+        order = models.Order.objects.get(user=user)
+        outbox = order.payment_outbox
+        assert outbox.status == "done"
+        assert outbox.attempts == 1
+        assert outbox.amount == order.total_amount == 40
+        line = order.products.get()
+        assert (line.unit_price, line.line_total) == (20, 40)
+        tx = models.Transaction.objects.get(order=order)
+        assert tx.stripe_payment_intent == order.stripe_payment_intent
+        assert resp.json()["clientSecret"].startswith(order.stripe_payment_intent)
+
+    def test_gateway_failure_leaves_pending_row(self, client, user, cart):
+        with patch.object(
+            FakeGateway, "create_intent", side_effect=PaymentGatewayError("timeout")
+        ):
+            resp = checkout(client)
+        assert resp.status_code == 202
+        order = models.Order.objects.get(user=user)
+        assert resp.json()["order_id"] == str(order.id)
+        payment_url = resp.json()["payment_url"]
+        assert payment_url.endswith(reverse("order-payment", args=[order.id]))
+
+        outbox = order.payment_outbox
+        assert outbox.status == "pending"
+        assert outbox.attempts == 1
+        assert outbox.last_error == "timeout"
+        assert not models.Transaction.objects.exists()
+        assert client.get(payment_url).json()["clientSecret"] is None
+
+        assert payments.retry_pending_intents() == 1
+        outbox.refresh_from_db()
+        assert outbox.status == "done"
+        assert models.Transaction.objects.filter(order=order).count() == 1
+        data = client.get(payment_url).json()
+        assert data["status"] == "done"
+        assert data["clientSecret"].startswith(
+            models.Order.objects.get().stripe_payment_intent
+        )
+
+    def test_payment_is_only_shown_to_the_buyer(self, client, cart, django_user_model):
+        checkout(client)
+        url = reverse("order-payment", args=[models.Order.objects.get().id])
+        other = django_user_model.objects.create_user(username="o", email="o@test.com")
+        client.force_authenticate(other)
+        assert client.get(url).status_code == 404
+
+    def test_intent_recorded_once(self, client, user, cart):
+        checkout(client)
+        outbox = models.PaymentOutbox.objects.get()
+        first = models.Order.objects.get().stripe_payment_intent
+
+        intent = payments.create_payment_intent(outbox.id)
+        assert intent.id == first
+        assert models.Transaction.objects.count() == 1
+
+    def test_gives_up_after_max_attempts(self, client, cart, settings):
+        settings.PAYMENT_MAX_ATTEMPTS = 2
+        with patch.object(
+            FakeGateway, "create_intent", side_effect=PaymentGatewayError("down")
+        ):
+            checkout(client)
+            assert payments.retry_pending_intents() == 0
+        outbox = models.PaymentOutbox.objects.get()
+        assert outbox.status == "failed"
+        assert outbox.attempts == 2
+        assert payments.retry_pending_intents() == 0
+
+    def test_lines_move_from_cart_to_order(self, client, user, cart):
+        product = cart.card_products.get().product
+        assert checkout(client).status_code == 200
+        assert not cart.card_products.exists()
+
+        # However long the payment takes, the expiry task leaves the order alone.
+        assert release_expired_reservations(ttl=0) == 0
+        product.refresh_from_db()
+        assert product.stock == 5
+        assert checkout(client).status_code == 400
+        assert models.Order.objects.count() == 1
+
+    @patch("stripe.Webhook.construct_event")
+    def test_payment_keeps_lines_added_after_checkout(
+        self, construct_event, client, user, cart
+    ):
+        checkout(client)
+        intent = models.Order.objects.get().stripe_payment_intent
+        later = cart.card_products.create(
+            product=models.Product.objects.create(name="Bulb", price=2), quantity=1
+        )
+        event = {"type": "payment_intent.succeeded", "data": {"object": {"id": intent}}}
+        construct_event.return_value = event
+        resp = client.post(
+            reverse("stripe-webhook"),
+            data=json.dumps(event),
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE="t",
+        )
+        assert resp.status_code == 200
+        assert list(cart.card_products.all()) == [later]
+
+    def test_empty_cart_skips_payment(self, client, user):
+        models.Card.objects.create(user=user)
+        resp = checkout(client)
+        assert resp.status_code == 400
+        assert not models.Order.objects.exists()
+        assert not models.PaymentOutbox.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_gateway_called_outside_transaction(client, cart):
+    seen = []
+
+    def create_intent(self, **kwargs):
+        seen.append(connection.in_atomic_block)
+        return PaymentIntent("pi_1", "cs_1", "requires_payment_method")
+
+    with patch.object(FakeGateway, "create_intent", create_intent):
+        resp = checkout(client)
+    assert resp.json() == {"clientSecret": "cs_1"}
+    assert seen == [False]
+
+
+def test_fake_gateway_is_idempotent():
+    gateway = FakeGateway()
+    first = gateway.create_intent(1000, "usd", {}, idempotency_key="a")
+    assert gateway.create_intent(1000, "usd", {}, idempotency_key="a") == first
+    assert gateway.create_intent(1000, "usd", {}, idempotency_key="b") != first
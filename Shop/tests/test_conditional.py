@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from Shop import models
+from Shop.views import FlashSaleAddProductsView
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def product(db):
+    category = models.Category.objects.create(name="Phones")
+    return models.Product.objects.create(name="iPhone", price=1000, category=category)
+
+
+@pytest.fixture
+def order(db, django_user_model, product):
+    user = django_user_model.objects.create_user(
+        username="buyer", email="buyer@test.com", password="1234"
+    )
+    order = models.Order.objects.create(user=user, latitude=41.3, longitude=69.2)
+    models.OrderedProduct.objects.create(order=order, product=product, quantity=2)
+    return order
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    def test_category_list_not_modified(self, api_client, product, django_assert_num_queries):
+        url = reverse("category-list")
+        first = api_client.get(url)
+        assert first.status_code == 200
+        assert first["ETag"].startswith('W/"')
+        assert "Last-Modified" in first
+
+        with django_assert_num_queries(1):
+            second = api_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        assert second.status_code == 304
+        assert second["ETag"] == first["ETag"]
+
+        second = api_client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        assert second.status_code == 304
+
+    def test_etag_varies_with_query_and_rows(self, api_client, product):
+        url = reverse("product-list")
+        etag = api_client.get(url)["ETag"]
+        assert api_client.get(url, {"page_size": 5})["ETag"] != etag
+
+        product.name = "iPhone 16"
+        product.save()
+        resp = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200
+        assert resp["ETag"] != etag
+
+    def test_cached_product_list_not_modified(
+        self, api_client, product, django_assert_num_queries
+    ):
+        url = reverse("product-list")
+        etag = api_client.get(url)["ETag"]
+
+        with django_assert_num_queries(0):
+            resp = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 304
+
+    def test_product_detail(self, api_client, product):
+        url = reverse("product-detail", args=[product.pk])
+        etag = api_client.get(url)["ETag"]
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    def test_flash_sale_assignment_changes_etag(self, api_client, product):
+        flash = models.FlashSales.objects.create(
+            start_at=timezone.now(), end_at=timezone.now() + timedelta(days=1)
+        )
+        url = reverse("flash-sale-list")
+        etag = api_client.get(url)["ETag"]
+
+        request = APIRequestFactory().post(
+            "", {"products": [str(product.id)]}, format="json"
+        )
+        FlashSaleAddProductsView.as_view()(request, pk=flash.id)
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_order_detail(self, api_client, django_user_model, order):
+        url = reverse("order-detail", args=[order.pk])
+        api_client.force_authenticate(order.user)
+        etag = api_client.get(url)["ETag"]
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        order.status = "shipped"
+        order.save()
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+        other = django_user_model.objects.create_user(
+            username="other", email="other@test.com", password="1234"
+        )
+        api_client.force_authenticate(other)
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 403
+
+    @pytest.mark.parametrize("basename", ["product", "category", "flash-sale"])
+    def test_malformed_id_is_404(self, api_client, basename):
+        url = reverse(f"{basename}-detail", args=["abc"])
+        assert api_client.get(url).status_code == 404
@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Shop import exports, models
+
+
+@pytest.fixture
+def staff(db, django_user_model):
+    return django_user_model.objects.create_user(
+        username="admin", email="admin@test.com", password="1234", is_staff=True
+    )
+
+
+@pytest.fixture
+def client(staff):
+    client = APIClient()
+    client.force_authenticate(staff)
+    return client
+
+
+@pytest.fixture
+def orders(staff):
+    product = models.Product.objects.create(name="Lamp, large", price=10, stock=100)
+    orders = []
+    for days in (40, 20, 1):
+        order = models.Order.objects.create(user=staff, latitude=1, longitude=1)
+        models.OrderedProduct.objects.create(order=order, product=product, quantity=2)
+        models.Transaction.objects.create(
+            user=staff, order=order, stripe_payment_intent=f"pi_{days}", amount=20
+        )
+        created = timezone.now() - timedelta(days=days)
+        models.Order.objects.filter(pk=order.pk).update(created_at=created)
+        models.Transaction.objects.filter(order=order).update(created_at=created)
+        orders.append(order)
+    models.Order.objects.snapshot_prices()
+    return orders
+
+
+def download(client, kind, fmt, **params):
+    resp = client.get(reverse("export", args=[kind, fmt]), params)
+    assert resp.status_code == 200, resp.content
+    assert resp.streaming
+    return b"".join(resp.streaming_content).decode()
+
+
+@pytest.mark.django_db
+class TestExports:
+    def test_orders_csv(self, client, orders):
+        rows = list(csv.reader(io.StringIO(download(client, "orders", "csv"))))
+        assert rows[0] == list(exports.EXPORTS["orders"].columns)
+        assert [row[0] for row in rows[1:]] == [str(o.id) for o in orders]
+        assert rows[1][3] == "admin@test.com"
+        assert rows[1][6] == "20.00"
+
+    def test_order_lines_jsonl(self, client, orders):
+        lines = download(client, "order_lines", "jsonl").splitlines()
+        rows = [json.loads(line) for line in lines]
+        assert [row["order_id"] for row in rows] == [str(o.id) for o in orders]
+        assert rows[0]["product__name"] == "Lamp, large"
+        assert rows[0]["line_total"] == "20.00"
+
+    def test_date_range(self, client, orders):
+        after = (timezone.now() - timedelta(days=30)).isoformat()
+        before = (timezone.now() - timedelta(days=10)).isoformat()
+        lines = download(
+            client, "transactions", "jsonl", created_after=after, created_before=before
+        ).splitlines()
+        assert [json.loads(line)["stripe_payment_intent"] for line in lines] == ["pi_20"]
+
+    def test_rows_are_flushed_in_batches(self, client, orders):
+        with patch.object(exports, "FLUSH_ROWS", 2):
+            resp = client.get(reverse("export", args=["orders", "csv"]))
+            chunks = list(resp.streaming_content)
+        # Header, then two flushes for three rows.
+        assert len(chunks) == 3
+
+    def test_bad_requests(self, client, orders):
+        assert client.get(reverse("export", args=["users", "csv"])).status_code == 404
+        assert client.get(reverse("export", args=["orders", "xml"])).status_code == 404
+        resp = client.get(
+            reverse("export", args=["orders", "csv"]),
+            {"created_after": timezone.now().isoformat(), "created_before": "2000-01-01T00:00"},
+        )
+        assert resp.status_code == 400
+
+    def test_staff_only(self, django_user_model, orders):
+        user = django_user_model.objects.create_user(username="c", email="c@t.com")
+        client = APIClient()
+        client.force_authenticate(user)
+        assert client.get(reverse("export", args=["orders", "csv"])).status_code == 403
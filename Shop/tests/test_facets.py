@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Shop import models
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def catalog(db):
+    phones = models.Category.objects.create(name="Phones")
+    books = models.Category.objects.create(name="Books")
+    rows = [
+        (phones, "100", 0, 0, 0),
+        (phones, "200", 5, 9, 2),
+        (phones, "300", 30, 3, 1),
+        (books, "10", 60, 0, 0),
+    ]
+    for category, price, discount, rating_sum, rating_count in rows:
+        models.Product.objects.create(
+            category=category,
+            name="item",
+            price=Decimal(price),
+            discount_percent=discount,
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            rating_avg=Decimal(rating_sum) / rating_count if rating_count else 0,
+        )
+    return phones, books
+
+
+@pytest.mark.django_db
+class TestProductFacets:
+    def test_counts(self, api_client, catalog, django_assert_max_num_queries):
+        phones, books = catalog
+        with django_assert_max_num_queries(4):
+            resp = api_client.get(reverse("product-facets"), {"buckets": 2})
+        assert resp.status_code == 200
+        data = resp.data
+
+        assert data["total"] == 4
+        assert [(c["name"], c["count"]) for c in data["categories"]] == [
+            ("Phones", 3),
+            ("Books", 1),
+        ]
+        assert [b["count"] for b in data["price"]] == [2, 2]
+        assert data["price"][0]["min"] == Decimal("4")
+        assert data["price"][-1]["max"] == Decimal("210")
+        assert {d["range"]: d["count"] for d in data["discount"]} == {
+            "0": 1,
+            "1-10": 1,
+            "11-25": 0,
+            "26-50": 1,
+            "51-100": 1,
+        }
+        assert {r["bucket"]: r["count"] for r in data["rating"]} == {
+            "unrated": 2,
+            "1+": 2,
+            "2+": 2,
+            "3+": 2,
+            "4+": 1,
+        }
+
+    def test_applies_product_filter(self, api_client, catalog):
+        phones, _ = catalog
+        resp = api_client.get(
+            reverse("product-facets"), {"category": phones.id, "price_min": 150}
+        )
+        assert resp.data["total"] == 2
+        assert len(resp.data["categories"]) == 1
+
+    def test_cached_per_filter_signature(self, api_client, catalog, django_assert_num_queries):
+        url = reverse("product-facets")
+        api_client.get(url, {"price_max": 200, "page": 1})
+        with django_assert_num_queries(0):
+            resp = api_client.get(url, {"price_max": 200, "page": 2, "sort": "stars"})
+        assert resp.data["total"] == 3
+
+    def test_empty(self, api_client, db):
+        resp = api_client.get(reverse("product-facets"))
+        assert resp.data["total"] == 0
+        assert resp.data["price"] == []
@@ -0,0 +1,192 @@
+import hashlib
+import json
+from unittest.mock import patch
+
+import pytest
+import stripe
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Shop import models
+from Shop.cache import cache_lock
+from Shop.idempotency import _cache_key
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def user(db, django_user_model):
+    return django_user_model.objects.create_user(
+        username="buyer", email="buyer@test.com", password="1234"
+    )
+
+
+@pytest.fixture
+def product(db):
+    return models.Product.objects.create(name="Lamp", price=20, stock=5)
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.mark.django_db
+class TestIdempotency:
+    def test_replay_does_not_add_twice(self, client, product):
+        data = {"product_id": product.id, "quantity": 2}
+        first = client.post(reverse("to-card"), data, HTTP_IDEMPOTENCY_KEY="k1")
+        second = client.post(reverse("to-card"), data, HTTP_IDEMPOTENCY_KEY="k1")
+
+        assert first.status_code == second.status_code == 200
+        assert second.json() == first.json()
+        assert second["Idempotent-Replayed"] == "true"
+        assert not first.has_header("Idempotent-Replayed")
+        product.refresh_from_db()
+        assert product.stock == 3
+        assert models.CardProduct.objects.get(product=product).quantity == 2
+
+    def test_without_key_every_request_runs(self, client, product):
+        data = {"product_id": product.id, "quantity": 1}
+        client.post(reverse("to-card"), data)
+        client.post(reverse("to-card"), data)
+        product.refresh_from_db()
+        assert product.stock == 3
+
+    def test_key_reused_with_other_body(self, client, product):
+        client.post(
+            reverse("to-card"),
+            {"product_id": product.id, "quantity": 1},
+            HTTP_IDEMPOTENCY_KEY="k1",
+        )
+        resp = client.post(
+            reverse("to-card"),
+            {"product_id": product.id, "quantity": 3},
+            HTTP_IDEMPOTENCY_KEY="k1",
+        )
+        assert resp.status_code == 422
+        product.refresh_from_db()
+        assert product.stock == 4
+
+    def test_keys_are_scoped_per_user(self, client, product, django_user_model):
+        other = django_user_model.objects.create_user(
+            username="other", email="other@test.com", password="1234"
+        )
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        data = {"product_id": product.id, "quantity": 1}
+        client.post(reverse("to-card"), data, HTTP_IDEMPOTENCY_KEY="k1")
+        resp = other_client.post(reverse("to-card"), data, HTTP_IDEMPOTENCY_KEY="k1")
+        assert not resp.has_header("Idempotent-Replayed")
+        product.refresh_from_db()
+        assert product.stock == 3
+
+    def test_failed_request_is_not_stored(self, client, product):
+        data = {"product_id": product.id, "quantity": 6}
+        resp = client.post(reverse("to-card"), data, HTTP_IDEMPOTENCY_KEY="k1")
+        assert resp.status_code == 400
+
+        product.stock = 10
+        product.save(update_fields=["stock"])
+        resp = client.post(reverse("to-card"), data, HTTP_IDEMPOTENCY_KEY="k1")
+        assert resp.status_code == 200
+
+    def test_in_flight_duplicate_is_rejected(self, client, user, product):
+        url = reverse("to-card")
+        request = type(
+            "Request",
+            (),
+            {"user": user, "method": "POST", "path": url},
+        )()
+        with patch("Shop.idempotency.LOCK_WAIT", 0.05):
+            with cache_lock(f"{_cache_key(request, 'k1')}:lock", 10, 0):
+                resp = client.post(
+                    url,
+                    {"product_id": product.id, "quantity": 1},
+                    HTTP_IDEMPOTENCY_KEY="k1",
+                )
+        assert resp.status_code == 409
+        product.refresh_from_db()
+        assert product.stock == 5
+
+    @patch("stripe.PaymentIntent.create")
+    def test_order_replay_creates_one_intent(self, mock_create, client, user, product):
+        mock_create.return_value = type(
+            "PI",
+            (),
+            {"id": "pi_1", "client_secret": "cs_1", "status": "requires_payment_method"},
+        )()
+        client.post(reverse("to-card"), {"product_id": product.id, "quantity": 1})
+        data = {"latitude": 41.31, "longitude": 69.28}
+        first = client.post(
+            reverse("to-order"), data, format="json", HTTP_IDEMPOTENCY_KEY="order-1"
+        )
+        second = client.post(
+            reverse("to-order"), data, format="json", HTTP_IDEMPOTENCY_KEY="order-1"
+        )
+
+        assert first.status_code == second.status_code == 200
+        assert second.json() == {"clientSecret": "cs_1"}
+        mock_create.assert_called_once()
+        assert models.Order.objects.filter(user=user).count() == 1
+
+    @patch("stripe.PaymentIntent.create")
+    def test_pending_order_is_replayed(self, mock_create, client, user, product):
+        mock_create.side_effect = stripe.error.APIConnectionError("down")
+        client.post(reverse("to-card"), {"product_id": product.id, "quantity": 1})
+        data = {"latitude": 41.31, "longitude": 69.28}
+        first = client.post(
+            reverse("to-order"), data, format="json", HTTP_IDEMPOTENCY_KEY="order-1"
+        )
+        second = client.post(
+            reverse("to-order"), data, format="json", HTTP_IDEMPOTENCY_KEY="order-1"
+        )
+
+        assert first.status_code == second.status_code == 202
+        assert second.json()["order_id"] == first.json()["order_id"]
+        assert second["Idempotent-Replayed"] == "true"
+        assert models.Order.objects.filter(user=user).count() == 1
+        assert models.PaymentOutbox.objects.count() == 1
+
+    def test_stored_body_is_not_readable(self, db):
+        data = {
+            "email": "new@test.com",
+            "password": "Secret123!",
+            "password_confirm": "Secret123!",
+        }
+        APIClient().post(reverse("register"), data, HTTP_IDEMPOTENCY_KEY="r1")
+        request = type("Request", (), {"user": AnonymousUser(), "method": "POST"})()
+        request.path = reverse("register")
+        stored = cache.get(_cache_key(request, "r1"))
+        raw = json.dumps(data, sort_keys=True, default=str)
+        assert stored["fingerprint"] != hashlib.sha1(raw.encode()).hexdigest()
+        assert stored["fingerprint"] != hashlib.sha256(raw.encode()).hexdigest()
+
+    def test_anonymous_register(self, db, django_user_model):
+        data = {
+            "email": "new@test.com",
+            "password": "Secret123!",
+            "password_confirm": "Secret123!",
+        }
+        client = APIClient()
+        first = client.post(reverse("register"), data, HTTP_IDEMPOTENCY_KEY="r1")
+        second = client.post(reverse("register"), data, HTTP_IDEMPOTENCY_KEY="r1")
+        assert first.status_code == second.status_code == 201
+        assert second["Idempotent-Replayed"] == "true"
+        assert django_user_model.objects.filter(email="new@test.com").count() == 1
+
+    @patch("Shop.views.send_contact_email.delay")
+    def test_contact_us_sends_once(self, delay, db):
+        data = {"name": "A", "email": "a@test.com", "message": "Hi"}
+        client = APIClient()
+        client.post(reverse("contact_us"), data, HTTP_IDEMPOTENCY_KEY="c1")
+        client.post(reverse("contact_us"), data, HTTP_IDEMPOTENCY_KEY="c1")
+        delay.assert_called_once()
+        assert models.ContactMessage.objects.count() == 1
@@ -0,0 +1,88 @@
+import io
+from unittest.mock import patch
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from Shop import models
+from Shop.tasks import generate_image_variants
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 255)).save(buffer, "PNG")
+    return SimpleUploadedFile("photo.png", buffer.getvalue(), content_type="image/png")
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.IMAGE_VARIANT_WIDTHS = (200, 400, 800)
+
+
+@pytest.fixture
+def product(db):
+    return models.Product.objects.create(
+        name="Lamp", description="A desk lamp", price=20, image=png(500, 250)
+    )
+
+
+@pytest.mark.django_db
+class TestImageVariants:
+    def test_generates_variants_up_to_original_width(self, product):
+        variants = generate_image_variants("Shop.Product", str(product.pk))
+
+        assert set(variants) == {"200", "400"}
+        with default_storage.open(variants["200"]["webp"]) as f:
+            image = Image.open(f)
+            assert (image.format, image.size) == ("WEBP", (200, 100))
+        with default_storage.open(variants["400"]["jpeg"]) as f:
+            assert Image.open(f).format == "JPEG"
+
+        product.refresh_from_db()
+        assert product.image_variants == variants
+
+    def test_replacing_image_drops_old_variants(self, product):
+        old = generate_image_variants("Shop.Product", str(product.pk))
+        product.refresh_from_db()
+        product.image = png(300, 300)
+        product.save()
+
+        new = generate_image_variants("Shop.Product", str(product.pk))
+        assert set(new) == {"200"}
+        assert not default_storage.exists(old["400"]["webp"])
+
+    def test_queued_on_upload_only(self, product, django_capture_on_commit_callbacks):
+        with patch("Shop.tasks.generate_image_variants.delay") as delay:
+            with django_capture_on_commit_callbacks(execute=True):
+                product.name = "Desk lamp"
+                product.save()
+            delay.assert_not_called()
+
+            with django_capture_on_commit_callbacks(execute=True):
+                product.image = png(100, 100)
+                product.save()
+            delay.assert_called_once_with("Shop.Product", str(product.pk))
+
+    def test_serializer_exposes_srcset(self, product):
+        variants = generate_image_variants("Shop.Product", str(product.pk))
+
+        resp = APIClient().get(reverse("product-detail", args=[product.pk]))
+        srcset = resp.data["image_srcset"]
+        assert list(srcset) == ["200w", "400w"]
+        assert srcset["200w"]["webp"].startswith("http://testserver/media/")
+        assert srcset["200w"]["webp"].endswith(variants["200"]["webp"])
+        assert "image_variants" not in resp.data
+
+    def test_profile_variants(self, django_user_model):
+        user = django_user_model.objects.create_user(
+            username="u", email="u@test.com", password="1234"
+        )
+        profile = models.Profile.objects.create(user=user, img=png(900, 900))
+
+        variants = generate_image_variants("Shop.Profile", str(profile.pk))
+        assert set(variants) == {"200", "400", "800"}
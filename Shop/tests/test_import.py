@@ -0,0 +1,116 @@
+import json
+from decimal import Decimal
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Shop import models
+from Shop.importer import ProductImporter
+
+CSV_FEED = """sku,name,description,price,stock,discount_percent,category
+A-1,Red phone,A small red phone,100.00,5,10,Phones
+A-2,Blue phone,A small blue phone,120.00,3,,Phones
+A-3,Cookbook,Recipes for every day,15.50,40,0,Books
+A-4,Broken,short,abc,1,0,Books
+"""
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def feed(tmp_path):
+    path = tmp_path / "feed.csv"
+    path.write_text(CSV_FEED)
+    return path
+
+
+@pytest.mark.django_db
+class TestProductImporter:
+    def test_import_and_resync(self, feed):
+        with open(feed) as stream:
+            stats = ProductImporter(chunk_size=2).run(stream, "csv")
+
+        assert (stats.rows, stats.created, stats.invalid) == (4, 3, 1)
+        assert stats.errors[0]["line"] == 5
+        assert set(stats.errors[0]["errors"]) == {"description", "price"}
+
+        phone = models.Product.objects.get(sku="A-1")
+        assert phone.category.name == "Phones"
+        assert phone.effective_price == Decimal("90.00")
+        assert models.Category.objects.filter(name="Phones").count() == 1
+
+        feed.write_text(CSV_FEED.replace("120.00", "110.00"))
+        with open(feed) as stream:
+            stats = ProductImporter().run(stream, "csv")
+
+        assert (stats.created, stats.updated, stats.unchanged) == (0, 1, 2)
+        assert models.Product.objects.get(sku="A-2").price == Decimal("110.00")
+        assert models.Product.objects.count() == 3
+
+    def test_resync_keeps_live_stock(self, feed):
+        with open(feed) as stream:
+            ProductImporter().run(stream, "csv")
+        phone = models.Product.objects.get(sku="A-1")
+        assert models.Product.reserve_stock(phone.pk, 2)
+
+        feed.write_text(CSV_FEED.replace("100.00,5", "95.00,9"))
+        with open(feed) as stream:
+            stats = ProductImporter().run(stream, "csv")
+
+        assert (stats.updated, stats.unchanged) == (1, 2)
+        phone.refresh_from_db()
+        assert (phone.price, phone.stock) == (Decimal("95.00"), 3)
+
+        feed.write_text(CSV_FEED.replace("100.00,5", "95.00,12"))
+        with open(feed) as stream:
+            assert ProductImporter().run(stream, "csv").unchanged == 3
+
+    def test_imported_products_are_searchable(self, api_client, feed):
+        call_command("import_products", str(feed))
+        resp = api_client.get(reverse("product-list"), {"search": "cookbook"})
+        assert [row["sku"] for row in resp.data["results"]] == ["A-3"]
+
+
+@pytest.mark.django_db
+class TestProductImportView:
+    def upload(self, rows):
+        body = "\n".join(json.dumps(row) for row in rows) + "\nnot json\n"
+        return SimpleUploadedFile("feed.jsonl", body.encode())
+
+    def test_staff_upload(self, api_client, django_user_model):
+        staff = django_user_model.objects.create_user(
+            username="admin", email="admin@test.com", password="1234", is_staff=True
+        )
+        api_client.force_authenticate(staff)
+        rows = [
+            {
+                "sku": "J-1",
+                "name": "Lamp",
+                "description": "A desk lamp, warm light",
+                "price": 20,
+            },
+            {"sku": "J-2", "name": "Chair", "description": "An office chair", "price": "75.5"},
+        ]
+        resp = api_client.post(
+            reverse("product-import-products"), {"file": self.upload(rows)}, format="multipart"
+        )
+        assert resp.status_code == 200
+        assert resp.data["created"] == 2
+        assert resp.data["invalid"] == 1
+        assert models.Product.objects.filter(sku__in=["J-1", "J-2"]).count() == 2
+
+    def test_requires_staff(self, api_client, django_user_model):
+        user = django_user_model.objects.create_user(
+            username="user", email="user@test.com", password="1234"
+        )
+        api_client.force_authenticate(user)
+        resp = api_client.post(
+            reverse("product-import-products"), {"file": self.upload([])}, format="multipart"
+        )
+        assert resp.status_code == 403
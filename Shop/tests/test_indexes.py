@@ -0,0 +1,58 @@
+import pytest
+
+from Shop import models
+from Shop.filters import ProductFilter
+
+
+@pytest.mark.django_db
+class TestHotPathIndexes:
+    def test_stripe_webhook_lookups(self, seeded_shop, assert_index_scan):
+        assert_index_scan(
+            models.Order.objects.filter(stripe_payment_intent="pi_1", paid=False),
+            "order_intent_idx",
+        )
+        assert_index_scan(
+            models.Order.objects.filter(stripe_payment_intent="pi_1"), "order_intent_idx"
+        )
+        assert_index_scan(
+            models.Transaction.objects.filter(stripe_payment_intent="pi_1"),
+            "transaction_intent_idx",
+        )
+
+    def test_product_category_and_price_filters(self, seeded_shop, assert_index_scan):
+        category = seeded_shop["categories"][0]
+        queryset = models.Product.objects.order_by("effective_price", "id")
+
+        filtered = ProductFilter(
+            {"category": category.id, "price_min": 20, "price_max": 60},
+            queryset=queryset,
+        ).qs
+        assert_index_scan(filtered, "product_cat_eff_price_idx")
+        assert_index_scan(
+            ProductFilter({"price_max": 30}, queryset=queryset).qs, "product_eff_price_idx"
+        )
+
+    def test_stars_by_product_and_user(self, seeded_shop, assert_index_scan):
+        product = seeded_shop["products"][0]
+        user = seeded_shop["users"][0]
+        ordering = ("-created_at", "id")
+
+        assert_index_scan(
+            models.Stars.objects.filter(product=product).order_by(*ordering)[:10],
+            "stars_product_created_idx",
+        )
+        assert_index_scan(
+            models.Stars.objects.filter(user=user).order_by(*ordering)[:10],
+            "stars_user_created_idx",
+        )
+
+    def test_orders_by_user_and_date(self, seeded_shop, assert_index_scan):
+        user = seeded_shop["users"][0]
+
+        assert_index_scan(
+            models.Order.objects.filter(user=user).order_by("-created_at")[:10],
+            "order_user_created_idx",
+        )
+        assert_index_scan(
+            models.Order.objects.order_by("-created_at", "id")[:20], "order_created_idx"
+        )
@@ -44,6 +44,17 @@ class TestModels(TestCase):
         )
         self.assertEqual(self.product.get_total_price(), correct_price)
 
+    def test_effective_price_tracks_price_and_discount(self):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.effective_price, Decimal("90.00"))
+
+        models.Product.objects.filter(pk=self.product.pk).update(
+            price=Decimal("80.00"), discount_percent=25
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.effective_price, Decimal("60.00"))
+        self.assertEqual(self.product.effective_price, self.product.get_total_price())
+
     def test_card_add_and_remove(self):
         added = self.card.to_card(self.product, quantity=2)
         self.assertTrue(added)
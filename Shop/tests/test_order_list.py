@@ -0,0 +1,117 @@
+import itertools
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Shop import models
+
+
+@pytest.fixture
+def staff(db, django_user_model):
+    return django_user_model.objects.create_user(
+        username="admin", email="admin@test.com", password="1234", is_staff=True
+    )
+
+
+@pytest.fixture
+def client(staff):
+    client = APIClient()
+    client.force_authenticate(staff)
+    return client
+
+
+@pytest.fixture
+def product(db):
+    return models.Product.objects.create(name="Lamp", price=10, stock=100)
+
+
+_seq = itertools.count()
+
+
+def make_orders(django_user_model, product, count, **fields):
+    orders = []
+    for _ in range(count):
+        n = next(_seq)
+        user = django_user_model.objects.create_user(
+            username=f"user{n}", email=f"user{n}@test.com"
+        )
+        order = models.Order.objects.create(user=user, latitude=1, longitude=1, **fields)
+        models.OrderedProduct.objects.create(order=order, product=product, quantity=1)
+        orders.append(order)
+    models.Order.objects.filter(id__in=[o.id for o in orders]).snapshot_prices()
+    return orders
+
+
+def walk(client, params):
+    seen = []
+    resp = client.get(reverse("order-list"), params)
+    while True:
+        assert resp.status_code == 200
+        assert "count" not in resp.data
+        seen += [row["id"] for row in resp.data["results"]]
+        if not resp.data["next"]:
+            return seen
+        resp = client.get(resp.data["next"])
+
+
+@pytest.mark.django_db
+class TestOrderList:
+    def test_keyset_walk_newest_first(self, client, django_user_model, product):
+        orders = make_orders(django_user_model, product, 7)
+        # Equal timestamps make the id tiebreaker matter.
+        models.Order.objects.filter(id__in=[o.id for o in orders[:4]]).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+
+        seen = walk(client, {"page_size": 3})
+        expected = [
+            str(pk)
+            for pk in models.Order.objects.order_by("-created_at", "id").values_list(
+                "id", flat=True
+            )
+        ]
+        assert seen == expected
+
+    @pytest.mark.parametrize("count", [3, 30])
+    def test_query_budget_is_constant(
+        self, client, django_user_model, product, count, django_assert_num_queries
+    ):
+        make_orders(django_user_model, product, count)
+        # Orders joined with their users, then the prefetched lines and products.
+        with django_assert_num_queries(3):
+            resp = client.get(reverse("order-list"), {"page_size": 20})
+        assert len(resp.data["results"]) == min(count, 20)
+        assert all(row["user"].startswith("user") for row in resp.data["results"])
+
+    def test_omit_user_skips_join(self, client, django_user_model, product):
+        make_orders(django_user_model, product, 2)
+        resp = client.get(reverse("order-list"), {"omit": "user"})
+        assert resp.status_code == 200
+        assert "user" not in resp.data["results"][0]
+
+    def test_filters(self, client, django_user_model, product):
+        pending = make_orders(django_user_model, product, 2)
+        shipped = make_orders(django_user_model, product, 2, status="shipped", paid=True)
+        old = pending[0]
+        models.Order.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=10)
+        )
+
+        def ids(params):
+            return set(walk(client, params))
+
+        assert ids({"status": "shipped"}) == {str(o.id) for o in shipped}
+        assert ids({"paid": "false"}) == {str(o.id) for o in pending}
+        assert ids({"user": str(shipped[0].user_id)}) == {str(shipped[0].id)}
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        assert str(old.id) not in ids({"created_after": since})
+        assert ids({"created_before": since}) == {str(old.id)}
+
+    def test_staff_only(self, django_user_model):
+        user = django_user_model.objects.create_user(username="c", email="c@t.com")
+        client = APIClient()
+        client.force_authenticate(user)
+        assert client.get(reverse("order-list")).status_code == 403
@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Shop import models
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def products(db):
+    # Repeated prices make the id tiebreaker matter.
+    return [
+        models.Product.objects.create(name=f"p{i}", price=Decimal(10 + i % 4))
+        for i in range(12)
+    ]
+
+
+def walk(api_client, url, params):
+    seen, pages = [], 0
+    resp = api_client.get(url, params)
+    while True:
+        assert resp.status_code == 200
+        assert "count" not in resp.data
+        seen += [row["id"] for row in resp.data["results"]]
+        pages += 1
+        if not resp.data["next"]:
+            return seen, pages
+        resp = api_client.get(resp.data["next"])
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+    @pytest.mark.parametrize("sort", [None, "price_up", "price_down", "stars"])
+    def test_walk_matches_ordering(self, api_client, products, sort):
+        params = {"pagination": "cursor", "page_size": 5}
+        if sort:
+            params["sort"] = sort
+        seen, pages = walk(api_client, reverse("product-list"), params)
+
+        ordering = {
+            None: ("id",),
+            "price_up": ("effective_price", "id"),
+            "price_down": ("-effective_price", "-id"),
+            "stars": ("-rating_sum", "id"),
+        }[sort]
+        expected = models.Product.objects.order_by(*ordering).values_list("id", flat=True)
+        assert seen == [str(pk) for pk in expected]
+        assert pages == 3
+
+    def test_previous_link(self, api_client, products):
+        url = reverse("product-list")
+        first = api_client.get(url, {"pagination": "cursor", "page_size": 5, "sort": "price_up"})
+        assert first.data["previous"] is None
+
+        second = api_client.get(first.data["next"])
+        back = api_client.get(second.data["previous"])
+        assert back.data["results"] == first.data["results"]
+
+    def test_page_cost_is_constant(self, api_client, products, django_assert_num_queries):
+        url = reverse("product-list")
+        first = api_client.get(url, {"pagination": "cursor", "page_size": 5})
+        second = api_client.get(first.data["next"])
+        with django_assert_num_queries(1):
+            api_client.get(second.data["next"])
+
+    def test_invalid_cursor(self, api_client, products):
+        resp = api_client.get(reverse("product-list"), {"cursor": "garbage"})
+        assert resp.status_code == 404
+
+    def test_page_number_mode_is_default(self, api_client, products):
+        resp = api_client.get(reverse("product-list"))
+        assert resp.data["count"] == len(products)
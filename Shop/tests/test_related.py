@@ -0,0 +1,74 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Shop import models
+from Shop.recommendations import CoPurchaseIndex, build_related_products
+
+
+@pytest.fixture
+def products(db):
+    return [
+        models.Product.objects.create(name=name, price=10)
+        for name in ("phone", "case", "charger", "cable", "book")
+    ]
+
+
+@pytest.fixture
+def baskets(db, django_user_model, products):
+    phone, case, charger, cable, book = products
+    user = django_user_model.objects.create_user(
+        username="buyer", email="buyer@test.com", password="1234"
+    )
+    for items in ([phone, case, charger], [phone, case], [phone, charger, cable]):
+        order = models.Order.objects.create(user=user, latitude=1, longitude=1)
+        for product in items:
+            models.OrderedProduct.objects.create(order=order, product=product)
+
+    card = models.Card.objects.create(user=user)
+    for product in (phone, case):
+        models.CardProduct.objects.create(card=card, product=product)
+
+
+def test_co_purchase_index_keeps_top_k():
+    index = CoPurchaseIndex(max_basket_size=3)
+    index.add_lines([(1, "a"), (1, "b"), (2, "a"), (2, "b"), (2, "c"), (3, "a"), (3, "c")])
+    index.add_basket(["a", "b", "c", "d"])
+
+    top = {(product, related): score for product, related, score in index.top(1)}
+    assert top == {("a", "b"): 2, ("b", "a"): 2, ("c", "a"): 2}
+    assert index.baskets == 3
+
+
+@pytest.mark.django_db
+class TestRelatedProducts:
+    def test_build_counts_orders_and_carts(self, products, baskets):
+        phone, case, charger, cable, book = products
+        build_related_products(top_k=2)
+
+        rows = models.RelatedProduct.objects.filter(product=phone).order_by("-score")
+        assert [(row.related_id, row.score) for row in rows] == [(case.id, 3), (charger.id, 2)]
+        assert not models.RelatedProduct.objects.filter(product=book).exists()
+
+    def test_rebuild_replaces_previous_index(self, products, baskets):
+        build_related_products(top_k=2)
+        models.OrderedProduct.objects.all().delete()
+        models.CardProduct.objects.all().delete()
+        call_command("build_related_products")
+        assert not models.RelatedProduct.objects.exists()
+
+    def test_endpoint(self, products, baskets, django_assert_num_queries):
+        phone, case, charger, cable, book = products
+        build_related_products()
+        url = reverse("product-related", args=[phone.pk])
+
+        with django_assert_num_queries(2):
+            resp = APIClient().get(url, {"limit": 2})
+        assert resp.status_code == 200
+        assert [row["name"] for row in resp.data] == ["case", "charger"]
+
+    @pytest.mark.parametrize("pk", ["abc", "00000000-0000-0000-0000-000000000000"])
+    def test_unknown_product_is_404(self, products, pk):
+        resp = APIClient().get(reverse("product-related", args=[pk]))
+        assert resp.status_code == 404
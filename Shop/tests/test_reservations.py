@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+
+from Shop import models
+from Shop.carts import CacheCart
+from Shop.reservations import release_expired_reservations
+
+
+@pytest.fixture
+def users(db, django_user_model):
+    return [
+        django_user_model.objects.create_user(
+            username=f"u{i}", email=f"u{i}@test.com", password="1234"
+        )
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def products(db):
+    return [
+        models.Product.objects.create(name=f"p{i}", price=10, stock=10) for i in range(2)
+    ]
+
+
+def reserve(user, product, quantity, age):
+    card, _ = models.Card.objects.get_or_create(user=user)
+    assert card.to_card(product, quantity=quantity)
+    models.CardProduct.objects.filter(card=card, product=product).update(
+        reserved_at=timezone.now() - timedelta(seconds=age)
+    )
+
+
+@pytest.mark.django_db
+class TestReleaseExpiredReservations:
+    def test_releases_only_expired_lines_in_batches(self, users, products):
+        first, second = products
+        reserve(users[0], first, 2, age=7200)
+        reserve(users[0], second, 1, age=7200)
+        reserve(users[1], first, 3, age=7200)
+        reserve(users[2], first, 4, age=60)
+
+        released = release_expired_reservations(ttl=3600, batch_size=2)
+
+        assert released == 3
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert (first.stock, second.stock) == (6, 10)
+        assert list(
+            models.CardProduct.objects.values_list("card__user", "quantity")
+        ) == [(users[2].pk, 4)]
+
+    def test_max_batches(self, users, products):
+        for user in users:
+            reserve(user, products[0], 1, age=7200)
+        assert release_expired_reservations(ttl=3600, batch_size=1, max_batches=2) == 2
+        assert models.CardProduct.objects.count() == 1
+
+    def test_adding_again_refreshes_reservation(self, users, products):
+        reserve(users[0], products[0], 1, age=7200)
+        users[0].card.to_card(products[0], quantity=1)
+        assert release_expired_reservations(ttl=3600) == 0
+
+    def test_reconciles_cached_carts(self, settings, users, products):
+        settings.CART_BACKEND = "cache"
+        cache.clear()
+        product = products[0]
+        reserve(users[0], product, 2, age=7200)
+        reserve(users[1], product, 2, age=7200)
+
+        dirty = CacheCart(users[0])
+        dirty.add(product.id, 3)
+        clean = CacheCart(users[1])
+        clean.save(clean.load())
+
+        release_expired_reservations(ttl=3600)
+
+        assert dirty.load()["lines"] == {str(product.id): 3}
+        assert cache.get(clean.key) is None
+        product.refresh_from_db()
+        assert product.stock == 7
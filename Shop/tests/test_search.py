@@ -0,0 +1,104 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Shop import models
+from Shop.search import InvertedIndexBackend
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def products(db):
+    return {
+        "phone": models.Product.objects.create(
+            name="Red phone", description="A small phone with a red case", price=100
+        ),
+        "case": models.Product.objects.create(
+            name="Phone case", description="Leather case, fits any red phone", price=10
+        ),
+        "laptop": models.Product.objects.create(
+            name="Laptop", description="Fast laptop for office work", price=900
+        ),
+    }
+
+
+@pytest.mark.django_db
+class TestProductSearch:
+    def test_search_ranks_name_matches_first(self, api_client, products):
+        resp = api_client.get(reverse("product-list"), {"search": "red phone"})
+        assert resp.status_code == 200
+        ids = [row["id"] for row in resp.data["results"]]
+        assert ids == [str(products["phone"].id), str(products["case"].id)]
+
+    def test_index_follows_product_save(self, api_client, products):
+        laptop = products["laptop"]
+        laptop.name = "Gaming notebook"
+        laptop.save()
+
+        resp = api_client.get(reverse("product-list"), {"search": "notebook"})
+        assert [row["id"] for row in resp.data["results"]] == [str(laptop.id)]
+
+    def test_explicit_sort_wins(self, api_client, products):
+        resp = api_client.get(
+            reverse("product-list"), {"search": "phone", "sort": "price_up"}
+        )
+        ids = [row["id"] for row in resp.data["results"]]
+        assert ids == [str(products["case"].id), str(products["phone"].id)]
+
+    @pytest.mark.skipif(
+        connection.vendor != "postgresql", reason="tsvector column is Postgres-only"
+    )
+    def test_rebuild_command(self, products):
+        models.Product.objects.update(search_vector=None)
+        call_command("rebuild_search_index")
+        assert not models.Product.objects.filter(search_vector=None).exists()
+
+    @pytest.mark.skipif(
+        connection.vendor != "postgresql", reason="float4 ts_rank is Postgres-only"
+    )
+    def test_cursor_walks_tied_ranks(self, api_client, products):
+        tied = [
+            models.Product.objects.create(name=f"Desk lamp {i}", price=10)
+            for i in range(5)
+        ]
+        seen = []
+        resp = api_client.get(
+            reverse("product-list"),
+            {"search": "lamp", "pagination": "cursor", "page_size": 2},
+        )
+        for _ in range(len(tied)):
+            assert resp.status_code == 200
+            seen += [row["id"] for row in resp.data["results"]]
+            if not resp.data["next"]:
+                break
+            resp = api_client.get(resp.data["next"])
+        assert seen == sorted(str(p.id) for p in tied)
+
+
+@pytest.mark.django_db
+class TestInvertedIndexBackend:
+    def test_ranking_and_and_semantics(self, products):
+        backend = InvertedIndexBackend()
+        qs = backend.search(models.Product.objects.all(), "red phone").order_by("-rank")
+        assert list(qs) == [products["phone"], products["case"]]
+        assert not backend.search(models.Product.objects.all(), "red laptop").exists()
+
+    def test_incremental_update(self, products):
+        backend = InvertedIndexBackend()
+        backend.rebuild()
+
+        laptop = products["laptop"]
+        laptop.name = "Gaming notebook"
+        backend.index(laptop)
+
+        assert backend.rank("notebook").keys() == {laptop.pk}
+        assert backend.rank("laptop").keys() == {laptop.pk}
+        laptop.description = "Office work"
+        backend.index(laptop)
+        assert backend.rank("laptop") == {}
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Shop import models
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def staff_user(db, django_user_model):
+    user = django_user_model.objects.create_user(
+        username="admin", email="admin@test.com", password="1234", is_staff=True
+    )
+    models.Profile.objects.create(user=user)
+    return user
+
+
+@pytest.fixture
+def product(db):
+    return models.Product.objects.create(
+        name="iPhone", description="A phone with a long description", price=1000
+    )
+
+
+def product_select(queries):
+    return next(
+        q["sql"] for q in queries if q["sql"].startswith('SELECT "Shop_product"."id"')
+    )
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+    def test_product_fields(self, api_client, product):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = api_client.get(
+                reverse("product-list"), {"fields": "id,name,effective_price"}
+            )
+        assert resp.status_code == 200
+        assert set(resp.data["results"][0]) == {"id", "name", "effective_price"}
+        assert resp.json()["results"][0]["effective_price"] == "1000.00"
+        assert '"description"' not in product_select(ctx.captured_queries)
+
+    def test_product_omit(self, api_client, product):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = api_client.get(reverse("product-list"), {"omit": "description"})
+        row = resp.data["results"][0]
+        assert "description" not in row
+        assert row["name"] == "iPhone"
+        assert '"description"' not in product_select(ctx.captured_queries)
+
+    def test_keyset_ordering_column_is_loaded(
+        self, api_client, product, django_assert_num_queries
+    ):
+        models.Product.objects.create(name="Pixel", description="Another phone", price=900)
+        params = {"fields": "id", "sort": "price_up", "pagination": "cursor", "page_size": 1}
+        with django_assert_num_queries(1):
+            resp = api_client.get(reverse("product-list"), params)
+        assert resp.data["next"]
+
+    def test_order_fields(self, api_client, staff_user):
+        models.Order.objects.create(user=staff_user, latitude=1, longitude=1)
+        api_client.force_authenticate(staff_user)
+        resp = api_client.get(reverse("order-list"), {"fields": "id,status_display"})
+        assert set(resp.data["results"][0]) == {"id", "status_display"}
+        assert resp.data["results"][0]["status_display"] == "Kutilmoqda"
+
+    def test_user_omit_profile(self, api_client, staff_user):
+        api_client.force_authenticate(staff_user)
+        resp = api_client.get(reverse("user-list"), {"omit": "profile,password"})
+        assert resp.status_code == 200
+        assert "profile" not in resp.data[0]
+        assert "password" not in resp.data[0]
+
+    def test_writes_ignore_selection(self, api_client, product):
+        category = models.Category.objects.create(name="Phones")
+        body = {
+            "name": "Pixel",
+            "description": "Another phone",
+            "price": "900.00",
+            "category": category.id,
+        }
+        resp = api_client.post(reverse("product-list") + "?fields=name", body)
+        assert resp.status_code == 201, resp.content
+        assert resp.data["category"] == category.id
+
+        url = reverse("product-detail", args=[product.id]) + "?omit=price"
+        resp = api_client.patch(url, {"price": "800.00"})
+        assert resp.status_code == 200
+        product.refresh_from_db()
+        assert product.price == 800
+
+    def test_nested_products_not_pruned(self, api_client, product):
+        flash = models.FlashSales.objects.create(
+            start_at=timezone.now(), end_at=timezone.now() + timedelta(days=1)
+        )
+        flash.products.add(product)
+        resp = api_client.get(reverse("flash-sale-list"), {"fields": "name"})
+        assert "description" in resp.data["results"][0]["products"][0]
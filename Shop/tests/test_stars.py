@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Shop import models
+from Shop.views import StarsViewSet
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def users(db, django_user_model):
+    return [
+        django_user_model.objects.create_user(
+            username=f"user{i}", email=f"user{i}@test.com", password="1234"
+        )
+        for i in range(2)
+    ]
+
+
+@pytest.fixture
+def product(db):
+    return models.Product.objects.create(name="iPhone", price=1000)
+
+
+@pytest.mark.django_db
+class TestRatingAggregates:
+    def test_create_and_destroy_update_product(self, api_client, users, product):
+        url = reverse("star-list")
+        for user, grade in zip(users, (5, 2)):
+            api_client.force_authenticate(user)
+            resp = api_client.post(url, {"product": product.id, "grade": grade})
+            assert resp.status_code == 201
+
+        product.refresh_from_db()
+        assert product.rating_sum == 7
+        assert product.rating_count == 2
+        assert product.rating_avg == Decimal("3.50")
+
+        star = models.Stars.objects.get(user=users[0])
+        api_client.force_authenticate(users[0])
+        resp = api_client.delete(reverse("star-detail", args=[star.id]))
+        assert resp.status_code == 204
+
+        product.refresh_from_db()
+        assert product.rating_sum == 2
+        assert product.rating_count == 1
+        assert product.rating_avg == Decimal("2.00")
+
+    def test_duplicate_star_does_not_count(self, api_client, users, product):
+        url = reverse("star-list")
+        api_client.force_authenticate(users[0])
+        api_client.post(url, {"product": product.id, "grade": 4})
+        resp = api_client.post(url, {"product": product.id, "grade": 4})
+        assert resp.status_code == 400
+
+        product.refresh_from_db()
+        assert product.rating_count == 1
+
+    def test_concurrent_destroy_shifts_once(self, users, product):
+        star = models.Stars.objects.create(user=users[0], product=product, grade=4)
+        models.Product.shift_rating(product.id, 4)
+        view = StarsViewSet()
+        # Both requests loaded the star before either deleted it.
+        view.perform_destroy(star)
+        view.perform_destroy(star)
+
+        product.refresh_from_db()
+        assert (product.rating_sum, product.rating_count) == (0, 0)
+        assert product.rating_avg == 0
+
+    def test_sort_by_stars(self, api_client, users, product):
+        other = models.Product.objects.create(name="Pixel", price=900)
+        models.Stars.objects.create(user=users[0], product=other, grade=5)
+        call_command("rebuild_ratings")
+
+        resp = api_client.get(reverse("product-list"), {"sort": "stars"})
+        assert resp.status_code == 200
+        assert resp.data["results"][0]["id"] == str(other.id)
+
+
+@pytest.mark.django_db
+def test_rebuild_ratings(users, product):
+    models.Stars.objects.create(user=users[0], product=product, grade=3)
+    models.Stars.objects.create(user=users[1], product=product, grade=4)
+
+    call_command("rebuild_ratings")
+
+    product.refresh_from_db()
+    assert product.rating_sum == 7
+    assert product.rating_count == 2
+    assert product.rating_avg == Decimal("3.50")
@@ -0,0 +1,194 @@
+import threading
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Shop import models
+
+
+@pytest.fixture
+def product(db):
+    return models.Product.objects.create(name="iPhone", price=1000, stock=5)
+
+
+@pytest.fixture
+def card(db, django_user_model):
+    user = django_user_model.objects.create_user(
+        username="buyer", email="buyer@test.com", password="1234"
+    )
+    return models.Card.objects.create(user=user)
+
+
+@pytest.mark.django_db
+class TestStockReservation:
+    def test_to_card_is_conditional(self, card, product):
+        assert card.to_card(product, quantity=3)
+        with CaptureQueriesContext(connection) as ctx:
+            assert card.to_card(product, quantity=2)
+        statements = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        assert len(statements) == 2
+        assert all(sql.startswith("UPDATE") for sql in statements)
+        assert not card.to_card(product, quantity=1)
+
+        product.refresh_from_db()
+        assert product.stock == 0
+        assert models.CardProduct.objects.get(card=card).quantity == 5
+
+    def test_remove_card_restores_stock(self, card, product):
+        card.to_card(product, quantity=4)
+        assert card.remove_card(product, quantity=1)
+        assert models.CardProduct.objects.get(card=card).quantity == 3
+
+        assert card.remove_card(product)
+        assert not card.remove_card(product)
+        product.refresh_from_db()
+        assert product.stock == 5
+
+    def test_view_rejects_over_reservation(self, card, product):
+        client = APIClient()
+        client.force_authenticate(card.user)
+        url = reverse("to-card")
+
+        resp = client.post(url, {"product_id": product.id, "quantity": 6})
+        assert resp.status_code == 400
+        assert client.post(url, {"product_id": product.id, "quantity": -1}).status_code == 400
+        product.refresh_from_db()
+        assert product.stock == 5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_reservations_never_oversell(django_user_model):
+    if connection.vendor != "postgresql":
+        pytest.skip("SQLite serializes writers; the race needs Postgres")
+
+    product = models.Product.objects.create(name="Console", price=500, stock=7)
+    cards = [
+        models.Card.objects.create(
+            user=django_user_model.objects.create_user(
+                username=f"u{i}", email=f"u{i}@test.com", password="1234"
+            )
+        )
+        for i in range(8)
+    ]
+    barrier = threading.Barrier(len(cards) * 2)
+    results = []
+
+    def reserve(card, quantity):
+        try:
+            barrier.wait()
+            results.append((card.to_card(product_stub, quantity=quantity), quantity))
+        finally:
+            connections.close_all()
+
+    product_stub = models.Product.objects.only("id", "stock").get(pk=product.pk)
+    threads = [
+        threading.Thread(target=reserve, args=(card, quantity))
+        for card in cards
+        for quantity in (1, 2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    product.refresh_from_db()
+    reserved = sum(
+        line.quantity for line in models.CardProduct.objects.filter(product=product)
+    )
+    assert len(results) == len(threads)
+    assert reserved == sum(quantity for added, quantity in results if added)
+    assert product.stock == 7 - reserved >= 0
+
+
+@pytest.mark.django_db
+class TestCardBatch:
+    def test_applies_operations_in_order(
+        self, card, product, django_assert_max_num_queries
+    ):
+        other = models.Product.objects.create(name="Case", price=10, stock=3)
+        card.to_card(other, quantity=1)
+        client = APIClient()
+        client.force_authenticate(card.user)
+
+        operations = [
+            {"action": "add", "product_id": str(product.id), "quantity": 3},
+            {"action": "add", "product_id": str(product.id), "quantity": 3},
+            {"action": "set", "product_id": str(other.id), "quantity": 3},
+            {"action": "remove", "product_id": str(product.id), "quantity": 1},
+            {"action": "add", "product_id": str(uuid.uuid4()), "quantity": 1},
+        ]
+        # Card lookup, two locking reads, one stock UPDATE and one upsert,
+        # plus the savepoints around them.
+        with django_assert_max_num_queries(9):
+            resp = client.post(
+                reverse("card-batch"), {"operations": operations}, format="json"
+            )
+
+        assert resp.status_code == 200
+        assert [(r["status"], r["quantity"]) for r in resp.data["results"]] == [
+            ("ok", 3),
+            ("insufficient_stock", 3),
+            ("ok", 3),
+            ("ok", 2),
+            ("product_not_found", 0),
+        ]
+        lines = dict(
+            models.CardProduct.objects.filter(card=card).values_list(
+                "product_id", "quantity"
+            )
+        )
+        assert lines == {product.id: 2, other.id: 3}
+        product.refresh_from_db()
+        other.refresh_from_db()
+        assert (product.stock, other.stock) == (3, 0)
+
+    def test_set_zero_removes_line(self, card, product):
+        card.to_card(product, quantity=2)
+        results = card.apply_operations(
+            [
+                {"action": "set", "product_id": product.id, "quantity": 0},
+                {"action": "remove", "product_id": product.id},
+            ]
+        )
+        assert [r["status"] for r in results] == ["ok", "not_in_card"]
+        assert not models.CardProduct.objects.filter(card=card).exists()
+        product.refresh_from_db()
+        assert product.stock == 5
+
+    def test_only_grown_lines_are_refreshed(self, card, product):
+        other = models.Product.objects.create(name="Bulb", price=2, stock=5)
+        card.to_card(product, quantity=1)
+        card.to_card(other, quantity=2)
+        old = timezone.now() - timedelta(hours=2)
+        models.CardProduct.objects.update(reserved_at=old)
+
+        card.apply_operations(
+            [
+                {"action": "add", "product_id": product.id, "quantity": 1},
+                {"action": "remove", "product_id": other.id, "quantity": 1},
+            ]
+        )
+
+        lines = {line.product_id: line for line in models.CardProduct.objects.all()}
+        assert lines[product.id].quantity == 2
+        assert lines[product.id].reserved_at > old
+        assert (lines[other.id].quantity, lines[other.id].reserved_at) == (1, old)
+
+    def test_validation(self, card, product):
+        client = APIClient()
+        client.force_authenticate(card.user)
+        url = reverse("card-batch")
+
+        assert client.post(url, {"operations": []}, format="json").status_code == 400
+        resp = client.post(
+            url,
+            {"operations": [{"action": "add", "product_id": str(product.id)}]},
+            format="json",
+        )
+        assert resp.status_code == 400
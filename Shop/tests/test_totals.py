@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from Shop import models
+
+
+@pytest.fixture
+def staff(db, django_user_model):
+    return django_user_model.objects.create_user(
+        username="admin", email="admin@test.com", password="1234", is_staff=True
+    )
+
+
+@pytest.fixture
+def products(db):
+    return [
+        models.Product.objects.create(
+            name="Pen", price=Decimal("0.99"), discount_percent=15, stock=10
+        ),
+        models.Product.objects.create(name="Lamp", price=Decimal("33.33"), stock=10),
+    ]
+
+
+def make_order(user, products, quantities, snapshot=True):
+    order = models.Order.objects.create(user=user, latitude=1, longitude=1)
+    models.OrderedProduct.objects.bulk_create(
+        models.OrderedProduct(order=order, product=product, quantity=quantity)
+        for product, quantity in zip(products, quantities)
+    )
+    if snapshot:
+        models.Order.objects.filter(pk=order.pk).snapshot_prices()
+        order.refresh_from_db()
+    return order
+
+
+@pytest.mark.django_db
+class TestLineTotals:
+    def test_totals_use_discounted_unit_price(self, staff, products):
+        order = make_order(staff, products, [3, 2])
+
+        # 0.99 * 85% = 0.8415 -> 0.84 per pen
+        expected = Decimal("0.84") * 3 + Decimal("33.33") * 2
+        assert order.total_price == expected
+        assert (order.total_amount, order.item_count) == (expected, 5)
+        pen = order.products.get(product=products[0])
+        assert (pen.unit_price, pen.discount_percent, pen.line_total) == (
+            Decimal("0.99"),
+            15,
+            Decimal("2.52"),
+        )
+        assert sum(item.total_price for item in order.products.all()) == expected
+
+    def test_price_change_keeps_order_total(self, staff, products):
+        order = make_order(staff, products, [1, 1])
+        models.Product.objects.filter(pk=products[1].pk).update(price=Decimal("50"))
+
+        order = models.Order.objects.get(pk=order.pk)
+        assert order.total_price == Decimal("0.84") + Decimal("33.33")
+        line = order.products.get(product=products[1])
+        assert line.total_price == Decimal("33.33")
+
+    def test_unsnapshotted_order_uses_live_prices(self, staff, products):
+        order = make_order(staff, products, [1, 2], snapshot=False)
+        assert order.total_amount is None
+        assert order.totals() == {
+            "total_amount": Decimal("0.84") + Decimal("33.33") * 2,
+            "item_count": 3,
+        }
+
+    def test_backfill_command(self, staff, products):
+        old = [make_order(staff, products, [2, 1], snapshot=False) for _ in range(3)]
+        call_command("backfill_order_prices", batch_size=2)
+
+        assert not models.Order.objects.filter(total_amount__isnull=True).exists()
+        assert not models.OrderedProduct.objects.filter(line_total__isnull=True).exists()
+        order = models.Order.objects.get(pk=old[0].pk)
+        assert order.total_amount == Decimal("0.84") * 2 + Decimal("33.33")
+        assert order.item_count == 3
+
+    def test_empty_card(self, staff):
+        card = models.Card.objects.create(user=staff)
+        assert card.totals() == {"total_amount": Decimal("0.00"), "item_count": 0}
+
+    def test_order_list_does_not_walk_lines(
+        self, staff, products, django_assert_num_queries
+    ):
+        for _ in range(5):
+            make_order(staff, products, [1, 4])
+        client = APIClient()
+        client.force_authenticate(staff)
+
+        # Orders with stored totals, then the prefetched lines and products.
+        with django_assert_num_queries(3):
+            resp = client.get(reverse("order-list"), {"omit": "user"})
+        row = resp.data["results"][0]
+        assert len(resp.data["results"]) == 5
+        assert row["total_price"] == Decimal("0.84") + Decimal("33.33") * 4
+        assert row["item_count"] == 5
+
+    def test_card_detail_totals(self, staff, products):
+        card = models.Card.objects.create(user=staff)
+        card.to_card(products[0], quantity=2)
+        client = APIClient()
+        client.force_authenticate(staff)
+
+        resp = client.get(reverse("card-detail", args=[card.pk]))
+        assert resp.data["total_price"] == Decimal("1.68")
+        assert resp.data["item_count"] == 2
@@ -30,8 +30,33 @@ urlpatterns = [
         name="change-order-status",
     ),
     path("orders/", OrderListView.as_view(), name="order-list"),
+    path(
+        "orders/bulk_status/",
+        views.BulkOrderStatusView.as_view(),
+        name="order-bulk-status",
+    ),
     path("orders/<uuid:pk>/", OrderRetrieveView.as_view(), name="order-detail"),
+    path(
+        "orders/<uuid:pk>/payment/",
+        views.OrderPaymentView.as_view(),
+        name="order-payment",
+    ),
+    path(
+        "analytics/sales/", views.SalesAnalyticsView.as_view(), name="analytics-sales"
+    ),
+    path(
+        "analytics/top_products/",
+        views.TopProductsAnalyticsView.as_view(),
+        name="analytics-top-products",
+    ),
+    path(
+        "analytics/categories/",
+        views.CategoryAnalyticsView.as_view(),
+        name="analytics-categories",
+    ),
+    path("exports/<slug:kind>.<slug:fmt>", views.ExportView.as_view(), name="export"),
     path("card/", views.CardListView.as_view(), name="card-list"),
+    path("card/batch/", views.CardBatchView.as_view(), name="card-batch"),
     path("card/<uuid:pk>/", views.CardRetriveView.as_view(), name="card-detail"),
     path(
         "reset_password_by_old_password/",
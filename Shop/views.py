@@ -1,15 +1,21 @@
 import os
+import time
 
 import requests
 import stripe
 from django.conf import settings
 from django.contrib.auth import get_user_model, logout
 from django.db import transaction, IntegrityError
-from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import permissions, status, viewsets, mixins
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import MultiPartParser
 from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -17,16 +23,40 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from Shop import permissions as custom_perms
-from Shop.filters import ProductFilter
-from Shop.models import Card, Category, Order, Product, Profile, Transaction, FlashSales, Stars
-from Shop.pagination import UniversalPagination
+from Shop import analytics, permissions as custom_perms
+from Shop.autocomplete import DEFAULT_LIMIT as AUTOCOMPLETE_LIMIT, autocomplete
+from Shop.cache import bump_catalog_version, product_facets_cache, product_list_cache
+from Shop.carts import get_cart
+from Shop.conditional import ConditionalGetMixin
+from Shop.exports import EXPORTS, FORMATS as EXPORT_FORMATS
+from Shop.facets import DEFAULT_PRICE_BUCKETS, MAX_PRICE_BUCKETS, product_facets
+from Shop.importer import FORMATS, ProductImporter, detect_format
+from Shop.filters import OrderFilter, ProductFilter
+from Shop.idempotency import idempotent
+from Shop.models import (
+    Card,
+    Category,
+    FlashSales,
+    Order,
+    PaymentOutbox,
+    Product,
+    Profile,
+    RelatedProduct,
+    Stars,
+    Transaction,
+)
+from Shop.pagination import KeysetPagination, UniversalPagination
 from Shop.serializers import (
+    AnalyticsRangeSerializer,
+    BulkOrderStatusSerializer,
+    CardBatchSerializer,
     CardSerializer,
     CategorySerializer,
     ChangeOrderStatusSerializer,
     ContactMessageSerializer,
     CustomTokenObtainPairSerializer,
+    ExportRangeSerializer,
+    OrderPaymentSerializer,
     OrderSerializer,
     ProductSerializer,
     RegisterSerializer,
@@ -38,7 +68,8 @@ from Shop.serializers import (
     ToOrderSerializer,
     UserSerializer,
     FlashSalesSerializer,
-    StarsSerializer
+    StarsSerializer,
+    PAYMENT_PENDING_MESSAGE,
 )
 import logging
 from Shop.tasks import send_contact_email
@@ -46,34 +77,120 @@ from Shop.tasks import send_contact_email
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
-class CategoryViewSet(ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
 
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     filterset_class = ProductFilter
     pagination_class = UniversalPagination
 
     def get_queryset(self):
-        qs = (
-            Product.objects
-            .select_related("category")
-            .prefetch_related("stars")
-        )
+        qs = Product.objects.all()
 
         sort = self.request.query_params.get("sort")
 
         if sort == "stars": #TODO swaggerga filter korsat
-            qs = qs.annotate(total_grade=Sum("stars__grade")).order_by("-total_grade")
+            qs = qs.order_by("-rating_sum", "id")
         elif sort == "price_up":
-            qs = qs.order_by("price")
+            qs = qs.order_by("effective_price", "id")
         elif sort == "price_down":
-            qs = qs.order_by("-price")
+            qs = qs.order_by("-effective_price", "-id")
+
+        return self.get_serializer_class().sparse_queryset(qs, self.request)
+
+    def get_list_conditional_state(self):
+        # Every catalog write bumps the version in the cache key, so the key
+        # itself validates the page without touching the database. Stock
+        # reservations do not bump it, so the tag also rolls over with the
+        # cache TTL to bound how stale a revalidated stock figure can be.
+        bucket = int(time.time()) // (settings.CATALOG_CACHE_TTL or 1)
+        return self.make_etag(product_list_cache.key(self.request), bucket), None
+
+    def list_response(self, request, *args, **kwargs):
+        key = product_list_cache.key(request)
+        data = product_list_cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list_response(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            product_list_cache.set(key, response.data)
+        return response
+
+    @swagger_auto_schema(responses={200: "Facet counts for the filtered products"})
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        key = product_facets_cache.key(request)
+        data = product_facets_cache.get(key)
+        if data is None:
+            try:
+                buckets = int(request.query_params.get("buckets", DEFAULT_PRICE_BUCKETS))
+            except ValueError:
+                buckets = DEFAULT_PRICE_BUCKETS
+            buckets = min(max(buckets, 1), MAX_PRICE_BUCKETS)
 
-        return qs
+            queryset = self.filter_queryset(self.get_queryset())
+            data = product_facets(queryset, price_field="effective_price", buckets=buckets)
+            product_facets_cache.set(key, data)
+
+        return Response(data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(responses={200: ProductSerializer(many=True)})
+    @action(detail=True, methods=["get"])
+    def related(self, request, pk=None):
+        try:
+            limit = int(request.query_params.get("limit", settings.RELATED_PRODUCTS_TOP_K))
+        except ValueError:
+            limit = settings.RELATED_PRODUCTS_TOP_K
+        limit = min(max(limit, 1), settings.RELATED_PRODUCTS_TOP_K)
+
+        product = self.get_object()
+        rows = (
+            RelatedProduct.objects.filter(product=product)
+            .select_related("related")
+            .order_by("-score", "related_id")[:limit]
+        )
+        serializer = self.get_serializer([row.related for row in rows], many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(responses={200: "Product name suggestions"})
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        try:
+            limit = int(request.query_params.get("limit", AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
+        data = autocomplete(request.query_params.get("q", ""), limit)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(responses={200: "Import summary"})
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[custom_perms.IsStaff],
+        parser_classes=[MultiPartParser],
+    )
+    def import_products(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"message": "file is required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fmt = request.data.get("format") or detect_format(upload.name)
+        if fmt not in FORMATS:
+            return Response(
+                {"message": f"format must be one of {', '.join(FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        stats = ProductImporter().run(upload, fmt)
+        return Response(stats.as_dict(), status=status.HTTP_200_OK)
 
 
 class Register(APIView):
@@ -81,6 +198,7 @@ class Register(APIView):
         request_body=RegisterSerializer,
         responses={201: RegisterSerializer()},
     )
+    @idempotent
     def post(self, request):
         serializer = RegisterSerializer(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
@@ -95,7 +213,7 @@ class UserList(APIView):
 
     @swagger_auto_schema(responses={200: UserSerializer(many=True)})
     def get(self, request):
-        users = User.objects.all()
+        users = UserSerializer.sparse_queryset(User.objects.all(), request)
         serializer = UserSerializer(
             instance=users, many=True, context={"request": request}
         )
@@ -142,15 +260,22 @@ class ResetPasswordConfirm(APIView):
 
 class CardListView(ListAPIView):
     permission_classes = (custom_perms.IsStaff,)
-    queryset = Card.objects.all().prefetch_related("card_products__product")
+    queryset = Card.objects.with_totals().prefetch_related("card_products__product")
     serializer_class = CardSerializer
 
 
 class CardRetriveView(RetrieveAPIView):
     permission_classes = (custom_perms.IsStaffOrOwner,)
-    queryset = Card.objects.all().prefetch_related("card_products__product")
+    queryset = Card.objects.with_totals().prefetch_related("card_products__product")
     serializer_class = CardSerializer
 
+    def get_object(self):
+        card = super().get_object()
+        # Lines still waiting in the cart cache are flushed before reading.
+        if get_cart(card.user).persist():
+            card = super().get_object()
+        return card
+
 
 class ToCardView(APIView):
     permission_classes = [custom_perms.IsClient]
@@ -158,6 +283,7 @@ class ToCardView(APIView):
     @swagger_auto_schema(
         request_body=ToCardSerializer, responses={200: "Product added to cart"}
     )
+    @idempotent
     def post(self, request):
         serializer = ToCardSerializer(data=request.data, context={"user": request.user})
         serializer.is_valid(raise_exception=True)
@@ -171,6 +297,7 @@ class RemoveCardView(APIView):
     @swagger_auto_schema(
         request_body=RemoveCardSerializer, responses={200: "Product removed from cart"}
     )
+    @idempotent
     def post(self, request):
         serializer = RemoveCardSerializer(
             data=request.data, context={"user": request.user}
@@ -182,25 +309,72 @@ class RemoveCardView(APIView):
         )
 
 
+class CardBatchView(APIView):
+    permission_classes = [custom_perms.IsClient]
+
+    @swagger_auto_schema(
+        request_body=CardBatchSerializer, responses={200: "Per-item results"}
+    )
+    @idempotent
+    def post(self, request):
+        serializer = CardBatchSerializer(
+            data=request.data, context={"user": request.user}
+        )
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
 class ToOrderView(APIView):
     permission_classes = [custom_perms.IsClient]
 
     @swagger_auto_schema(
-        request_body=ToOrderSerializer, responses={200: "Client Intent"}
+        request_body=ToOrderSerializer,
+        responses={
+            200: "Client Intent",
+            202: "Order saved, payment pending; poll the order payment endpoint",
+        },
     )
+    @idempotent
     def post(self, request):
         serializer = ToOrderSerializer(
             data=request.data, context={"user": request.user}
         )
         serializer.is_valid(raise_exception=True)
-        client_secret = serializer.save()
+        result = serializer.save()
 
-        if client_secret:
-            return Response({"clientSecret": client_secret}, status=status.HTTP_200_OK)
-        else:
+        if result is None:
             return Response(
                 {"message": "savatda product yo'q"}, status=status.HTTP_400_BAD_REQUEST
             )
+        order, client_secret = result
+        if client_secret is None:
+            return Response(
+                {
+                    "message": PAYMENT_PENDING_MESSAGE,
+                    "order_id": str(order.id),
+                    "payment_url": request.build_absolute_uri(
+                        reverse("order-payment", args=[order.id])
+                    ),
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
+        return Response({"clientSecret": client_secret}, status=status.HTTP_200_OK)
+
+
+class OrderPaymentView(APIView):
+    """The buyer's payment state for an order, with the client secret once ready."""
+
+    permission_classes = [custom_perms.IsClient]
+
+    @swagger_auto_schema(responses={200: OrderPaymentSerializer})
+    def get(self, request, pk):
+        outbox = PaymentOutbox.objects.filter(order_id=pk, order__user=request.user).first()
+        if outbox is None:
+            return Response(
+                {"message": "Order not Found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(OrderPaymentSerializer(outbox).data, status=status.HTTP_200_OK)
 
 
 class ChangeOrderStatus(APIView):
@@ -219,16 +393,120 @@ class ChangeOrderStatus(APIView):
         )
 
 
+class BulkOrderStatusView(APIView):
+    permission_classes = [custom_perms.IsStaff]
+
+    @swagger_auto_schema(
+        request_body=BulkOrderStatusSerializer,
+        responses={200: "Changed, rejected and not found order ids"},
+    )
+    def post(self, request):
+        serializer = BulkOrderStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save(), status=status.HTTP_200_OK)
+
+
 class OrderListView(ListAPIView):
-    queryset = Order.objects.all().prefetch_related("products__product")
+    queryset = Order.objects.prefetch_related("products__product").order_by(
+        "-created_at", "id"
+    )
     serializer_class = OrderSerializer
     permission_classes = [custom_perms.IsStaff]
+    filterset_class = OrderFilter
+    # No COUNT and no OFFSET: every page costs the same however many orders
+    # there are, and the ordering is served by order_created_idx.
+    pagination_class = KeysetPagination
 
+    def get_queryset(self):
+        queryset = OrderSerializer.sparse_queryset(super().get_queryset(), self.request)
+        if "user" in self.get_serializer().fields:
+            queryset = queryset.select_related("user")
+        return queryset
 
-class OrderRetrieveView(RetrieveAPIView):
-    queryset = Order.objects.all().prefetch_related("products__product")
+
+class OrderRetrieveView(ConditionalGetMixin, RetrieveAPIView):
+    queryset = Order.objects.prefetch_related("products__product")
     serializer_class = OrderSerializer
     permission_classes = [custom_perms.IsStaffOrOwner]
+    modified_fields = ("updated_at", "products__product__updated_at")
+
+    def get_queryset(self):
+        return OrderSerializer.sparse_queryset(super().get_queryset(), self.request)
+
+    def get_conditional_queryset(self, queryset):
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(user_id=self.request.user.pk)
+
+
+class ExportView(APIView):
+    """
+    Streams every row of an export as CSV or JSON lines. Rows are read with
+    a server-side cursor and written as they arrive, so memory stays flat
+    whatever the date range.
+    """
+
+    permission_classes = [custom_perms.IsStaff]
+
+    @swagger_auto_schema(
+        query_serializer=ExportRangeSerializer,
+        responses={200: "CSV or JSON lines file"},
+    )
+    def get(self, request, kind, fmt):
+        export = EXPORTS.get(kind)
+        if export is None or fmt not in EXPORT_FORMATS:
+            raise NotFound()
+        params = ExportRangeSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        content_type, stream = EXPORT_FORMATS[fmt]
+        rows = export.rows(**params.validated_data)
+        response = StreamingHttpResponse(
+            stream(export.columns, rows), content_type=content_type
+        )
+        filename = f"{kind}-{timezone.now():%Y%m%d%H%M%S}.{fmt}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class AnalyticsView(APIView):
+    """
+    Staff sales reports read from the daily rollup tables only. Subclasses
+    set ``report`` to an ``analytics`` function taking the date range, plus
+    the query params named in ``report_params``.
+    """
+
+    permission_classes = [custom_perms.IsStaff]
+    report = None
+    report_params = ()
+
+    @swagger_auto_schema(query_serializer=AnalyticsRangeSerializer)
+    def get(self, request):
+        params = AnalyticsRangeSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        results = self.report(
+            data["date_from"],
+            data["date_to"],
+            **{name: data[name] for name in self.report_params},
+        )
+        return Response(
+            {"date_from": data["date_from"], "date_to": data["date_to"], "results": results},
+            status=status.HTTP_200_OK,
+        )
+
+
+class SalesAnalyticsView(AnalyticsView):
+    report = staticmethod(analytics.daily_sales)
+
+
+class TopProductsAnalyticsView(AnalyticsView):
+    report = staticmethod(analytics.top_products)
+    report_params = ("by", "limit")
+
+
+class CategoryAnalyticsView(AnalyticsView):
+    report = staticmethod(analytics.category_sales)
 
 
 class ResetPasswordByOldPassword(APIView):
@@ -261,6 +539,7 @@ class ContactUsView(APIView):
         request_body=ContactMessageSerializer,
         responses={201: "Message sent successfully"},
     )
+    @idempotent
     def post(self, request):
         serializer = ContactMessageSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -363,22 +642,28 @@ class StripeWebhookView(APIView):  # TODO
         )
 
         if event.get("type") == "payment_intent.succeeded":
-            try:
-                order = Order.objects.get(stripe_payment_intent=intent_id)
-            except Order.DoesNotExist:
+            order = Order.objects.filter(
+                stripe_payment_intent=intent_id, paid=False
+            ).first()
+
+            if order is None:
+                if Order.objects.filter(stripe_payment_intent=intent_id).exists():
+                    # Redelivered event for an order that is already paid.
+                    transact_qs.update(status="success")
+                    return Response({"status": "success"}, status=status.HTTP_200_OK)
+
                 logger.warning("Order not found for intent %s", intent_id)
                 return Response(
                     {"status": "order_not_found"}, status=status.HTTP_404_NOT_FOUND
                 )
 
             with transaction.atomic():
-                order.paid = True
-                order.save()
-                try:
-                    card = Card.objects.get(user=order.user)
-                    card.card_products.all().delete()
-                except Card.DoesNotExist:
-                    pass
+                paid_at = timezone.now()
+                # Only the delivery that flips the flag adds to the rollups.
+                if Order.objects.filter(pk=order.pk, paid=False).update(
+                    paid=True, paid_at=paid_at, updated_at=paid_at
+                ):
+                    analytics.record_paid_order(order.pk, paid_at)
 
             transact_qs.update(status="success")
             return Response({"status": "success"}, status=status.HTTP_200_OK)
@@ -392,6 +677,7 @@ class StripeWebhookView(APIView):  # TODO
             return Response({"status": "ignored"}, status=status.HTTP_200_OK)
 
 class FlashSaleViewSet(
+    ConditionalGetMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.CreateModelMixin,
@@ -400,6 +686,7 @@ class FlashSaleViewSet(
     queryset = FlashSales.objects.all().prefetch_related("products")
     serializer_class = FlashSalesSerializer
     permission_classes = [custom_perms.IsStaffOrReadOnly]
+    modified_fields = ("updated_at", "products__updated_at")
 
 
 class FlashSaleAddProductsView(APIView):
@@ -414,6 +701,9 @@ class FlashSaleAddProductsView(APIView):
         product_ids = request.data.get("products", [])
         products = Product.objects.filter(id__in=product_ids)
         flash_sale.products.add(*products)
+        products.update(updated_at=timezone.now())
+        flash_sale.save(update_fields=["updated_at"])
+        bump_catalog_version()
         return Response({"status": "products added"}, status=status.HTTP_200_OK)
 
 
@@ -429,6 +719,9 @@ class FlashSaleRemoveProductsView(APIView):
         product_ids = request.data.get("products", [])
         products = Product.objects.filter(id__in=product_ids)
         flash_sale.products.remove(*products)
+        products.update(updated_at=timezone.now())
+        flash_sale.save(update_fields=["updated_at"])
+        bump_catalog_version()
         return Response({"status": "products removed"}, status=status.HTTP_200_OK)
 
 class StarsViewSet(
@@ -438,7 +731,9 @@ class StarsViewSet(
     mixins.DestroyModelMixin,
     viewsets.GenericViewSet,
 ):
-    queryset = Stars.objects.all().select_related("user", "product")
+    queryset = (
+        Stars.objects.all().select_related("user", "product").order_by("-created_at", "id")
+    )
     serializer_class = StarsSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = UniversalPagination
@@ -467,10 +762,18 @@ class StarsViewSet(
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def perform_create(self, serializer):
-        serializer.save()
+        with transaction.atomic():
+            star = serializer.save()
+            Product.shift_rating(star.product_id, star.grade)
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         if instance.user != request.user and not request.user.is_staff:
             return Response({"detail": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
-        return super().destroy(request, *args, **kwargs)
\ No newline at end of file
+        return super().destroy(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # A concurrent DELETE of the same star may already have removed it.
+            if Stars.objects.filter(pk=instance.pk).delete()[0]:
+                Product.shift_rating(instance.product_id, instance.grade, count=-1)
\ No newline at end of file
@@ -159,6 +159,8 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+IMAGE_VARIANT_WIDTHS = (200, 400, 800)
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 EMAIL_BACKEND = os.getenv("EMAIL_BACKEND")
@@ -171,15 +173,72 @@ EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 
 AUTH_USER_MODEL = "Shop.User"
 
+CACHE_URL = os.getenv("CACHE_URL")
+
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", 60))
+CATALOG_CACHE_LOCAL_MAX_BYTES = int(
+    os.getenv("CATALOG_CACHE_LOCAL_MAX_BYTES", 8 * 1024 * 1024)
+)
+
+# "db" writes cart changes straight to CardProduct; "cache" keeps cart lines
+# in the cache and persists them in the background and at checkout.
+CART_BACKEND = os.getenv("CART_BACKEND", "db")
+CART_CACHE_TIMEOUT = int(os.getenv("CART_CACHE_TIMEOUT", 7 * 24 * 60 * 60))
+CART_PERSIST_DELAY = int(os.getenv("CART_PERSIST_DELAY", 10))
+# Cart lines hold stock for this long after they were last added to, then
+# the release task returns it.
+CART_RESERVATION_TTL = int(os.getenv("CART_RESERVATION_TTL", 2 * 60 * 60))
+CART_RELEASE_BATCH_SIZE = int(os.getenv("CART_RELEASE_BATCH_SIZE", 5000))
+
+RELATED_PRODUCTS_TOP_K = int(os.getenv("RELATED_PRODUCTS_TOP_K", 20))
+
+# Responses to POSTs carrying an Idempotency-Key are replayed for this long.
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 60 * 60))
+
 CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_RESULT_BACKEND = "redis://localhost:6379/0"
 CELERY_TIMEZONE = "Asia/Tashkent"
+CELERY_BEAT_SCHEDULE = {
+    "release-expired-reservations": {
+        "task": "Shop.tasks.release_expired_reservations",
+        "schedule": 60.0,
+    },
+    "retry-payment-intents": {
+        "task": "Shop.tasks.retry_payment_intents",
+        "schedule": 60.0,
+    },
+}
 
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
 
+# "stripe" or "fake"; the fake gateway creates intents in memory for offline
+# load tests, sleeping PAYMENT_FAKE_LATENCY seconds per intent.
+PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "stripe")
+PAYMENT_GATEWAY_TIMEOUT = float(os.getenv("PAYMENT_GATEWAY_TIMEOUT", 10))
+PAYMENT_GATEWAY_RETRIES = int(os.getenv("PAYMENT_GATEWAY_RETRIES", 2))
+PAYMENT_FAKE_LATENCY = float(os.getenv("PAYMENT_FAKE_LATENCY", 0))
+# Intents that failed at checkout are retried by a periodic task this many
+# seconds after the last attempt, and given up after PAYMENT_MAX_ATTEMPTS.
+PAYMENT_RETRY_DELAY = int(os.getenv("PAYMENT_RETRY_DELAY", 30))
+PAYMENT_MAX_ATTEMPTS = int(os.getenv("PAYMENT_MAX_ATTEMPTS", 5))
+
 # TODO
 INSTALLED_APPS += ["corsheaders"]
 
@@ -195,4 +254,5 @@ CORS_ALLOW_HEADERS = [
     "user-agent",
     "accept-encoding",
     "connection",
+    "idempotency-key",
 ]